@@ -1,33 +1,37 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from celery.result import AsyncResult
+from elasticsearch.exceptions import ConflictError
 from datetime import datetime
 import json
 
-from es.repositories import ApplicationRepository, JobRepository, UserRepository
-from ml.ranking import RankingService
+from es.repositories import ApplicationRepository, JobRepository, user_repo
+from ml.ranking import normalized_location, normalized_skills, ranking_service
+from common.renderers import stream_json_array
 from common.utils import generate_uuid
+from .tasks import rerank_job
+from .decorators import require_role
 
 application_repo = ApplicationRepository()
 job_repo = JobRepository()
-user_repo = UserRepository()
-ranking_service = RankingService()
+
+_ROLE_SEEKER = 'seeker'
+_ROLE_RECRUITER = 'recruiter'
+
+_ALLOWED_STATUSES = frozenset(('applied', 'screening', 'shortlisted', 'interviewed', 'offered', 'rejected'))
 
 @api_view(['POST'])
+@require_role(_ROLE_SEEKER, message='Only job seekers can apply to jobs')
 def apply_to_job(request, job_id):
     """Apply to a job"""
     try:
-        user_id = getattr(request, 'user_id', None)
-        if not user_id:
-            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        user = user_repo.get_by_id(user_id)
-        if not user or user['role'] != 'seeker':
-            return Response({'error': 'Only job seekers can apply to jobs'}, status=status.HTTP_403_FORBIDDEN)
+        user_id = request.user_id
+        user = request.user_obj
         
         job = job_repo.get_by_id(job_id)
         if not job:
@@ -37,51 +41,43 @@ def apply_to_job(request, job_id):
             return Response({'error': 'This job is no longer accepting applications'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Check if already applied
-        existing_application = application_repo.get_by_job_and_seeker(job_id, user_id)
-        if existing_application:
+        if application_repo.exists_for_job_and_seeker(job_id, user_id):
             return Response({'error': 'You have already applied to this job'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Calculate match scores
         scores = {'bm25': 0.0, 'semantic': 0.0, 'rule_boost': 0.0, 'final': 0.0}
         
         if user.get('resume_vec') and job.get('job_vec'):
-            # Calculate hybrid score
-            final_score = ranking_service.calculate_hybrid_score(
+            # Calculate the hybrid score and its components in one pass
+            scores = ranking_service.score(
                 resume_text=user.get('resume_text', ''),
                 resume_vec=user['resume_vec'],
                 job_text=f"{job['title']} {job['description']}",
                 job_vec=job['job_vec'],
-                resume_skills=user.get('skills', []),
-                job_skills=job.get('skills_required', []),
+                resume_skills=normalized_skills(user, 'skills'),
+                job_skills=normalized_skills(job, 'skills_required'),
                 resume_exp=user.get('experience_years'),
                 job_min_exp=job.get('min_exp'),
-                same_location=(user.get('location', '').lower() == job.get('location', '').lower())
+                same_location=(normalized_location(user) == normalized_location(job))
             )
-            
-            # Break down scores (simplified)
-            scores = {
-                'bm25': ranking_service.calculate_bm25_score(user.get('resume_text', ''), f"{job['title']} {job['description']}"),
-                'semantic': ranking_service.calculate_semantic_score(user['resume_vec'], job['job_vec']),
-                'rule_boost': ranking_service.calculate_rule_boost(
-                    user.get('skills', []), job.get('skills_required', []),
-                    user.get('experience_years'), job.get('min_exp'),
-                    user.get('location', '').lower() == job.get('location', '').lower()
-                ),
-                'final': final_score
-            }
         
         # Create application
+        now = datetime.utcnow().isoformat()
         application_data = {
-            'id': generate_uuid(),
             'job_id': job_id,
             'seeker_id': user_id,
             'status': 'applied',
             'scores': scores,
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat()
+            'created_at': now,
+            'updated_at': now
         }
         
-        created_application = application_repo.create(application_data)
+        # The ID comes from job and seeker, so the already-applied check sees it without a refresh,
+        # and a concurrent duplicate apply fails here instead of overwriting the application
+        try:
+            created_application = application_repo.create(application_data)
+        except ConflictError:
+            return Response({'error': 'You have already applied to this job'}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(created_application, status=status.HTTP_201_CREATED)
         
@@ -89,41 +85,36 @@ def apply_to_job(request, job_id):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@require_role(_ROLE_SEEKER, message='Only job seekers can view their applications')
 def get_my_applications(request):
     """Get applications for current job seeker"""
     try:
-        user_id = getattr(request, 'user_id', None)
-        if not user_id:
-            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        user = user_repo.get_by_id(user_id)
-        if not user or user['role'] != 'seeker':
-            return Response({'error': 'Only job seekers can view their applications'}, status=status.HTTP_403_FORBIDDEN)
+        user_id = request.user_id
         
         applications = application_repo.get_by_seeker(user_id)
         
-        # Enrich with job data
-        for application in applications:
-            job = job_repo.get_by_id(application['job_id'])
-            if job:
-                application['job'] = job
+        # Enrich with job data, fetching each distinct job once
+        job_ids = {application['job_id'] for application in applications}
+        jobs = job_repo.get_many_summaries(job_ids)
         
-        return Response(applications, status=status.HTTP_200_OK)
+        def enriched_applications():
+            for application in applications:
+                job = jobs.get(application['job_id'])
+                if job:
+                    application['job'] = job
+                yield application
+        
+        return StreamingHttpResponse(stream_json_array(enriched_applications()), content_type='application/json')
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@require_role(_ROLE_RECRUITER, message='Only recruiters can view job applications')
 def get_job_applications(request):
     """Get applications for recruiter's jobs"""
     try:
-        user_id = getattr(request, 'user_id', None)
-        if not user_id:
-            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        user = user_repo.get_by_id(user_id)
-        if not user or user['role'] != 'recruiter':
-            return Response({'error': 'Only recruiters can view job applications'}, status=status.HTTP_403_FORBIDDEN)
+        user_id = request.user_id
         
         # Get all recruiter's jobs
         jobs = job_repo.get_by_recruiter(user_id)
@@ -133,29 +124,32 @@ def get_job_applications(request):
         applications = application_repo.get_by_jobs(job_ids)
         
         # Enrich with job and seeker data
-        for application in applications:
-            job = job_repo.get_by_id(application['job_id'])
-            if job:
-                application['job'] = job
-            
-            seeker = user_repo.get_by_id(application['seeker_id'])
-            if seeker:
-                # Remove sensitive data
-                seeker_data = {k: v for k, v in seeker.items() if k not in ['password_hash', 'resume_text', 'resume_vec']}
-                application['seeker'] = seeker_data
+        jobs_by_id = {job['id']: job for job in jobs}
+        # Sensitive seeker fields are excluded by Elasticsearch before they reach us
+        seekers = user_repo.get_many_public(application['seeker_id'] for application in applications)
+        
+        def enriched_applications():
+            for application in applications:
+                job = jobs_by_id.get(application['job_id'])
+                if job:
+                    application['job'] = job
+                
+                seeker = seekers.get(application['seeker_id'])
+                if seeker:
+                    application['seeker'] = seeker
+                yield application
         
-        return Response(applications, status=status.HTTP_200_OK)
+        return StreamingHttpResponse(stream_json_array(enriched_applications()), content_type='application/json')
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@require_role(_ROLE_RECRUITER, message='Only recruiters can view job applications')
 def get_job_applications_by_id(request, job_id):
     """Get applications for a specific job"""
     try:
-        user_id = getattr(request, 'user_id', None)
-        if not user_id:
-            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+        user_id = request.user_id
         
         job = job_repo.get_by_id(job_id)
         if not job:
@@ -165,18 +159,22 @@ def get_job_applications_by_id(request, job_id):
         if job['recruiter_id'] != user_id:
             return Response({'error': 'You can only view applications for your own jobs'}, status=status.HTTP_403_FORBIDDEN)
         
-        applications = application_repo.get_by_job(job_id)
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            size = min(100, max(1, int(request.query_params.get('size', 50))))
+        except ValueError:
+            return Response({'error': 'Invalid pagination parameters'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Sort by final score (highest first)
-        applications.sort(key=lambda x: x.get('scores', {}).get('final', 0), reverse=True)
+        # Elasticsearch returns the page already sorted by final score (highest first)
+        applications = application_repo.get_by_job(job_id, size=size, offset=(page - 1) * size)
         
         # Enrich with seeker data
+        # Sensitive seeker fields are excluded by Elasticsearch before they reach us
+        seekers = user_repo.get_many_public(application['seeker_id'] for application in applications)
         for application in applications:
-            seeker = user_repo.get_by_id(application['seeker_id'])
+            seeker = seekers.get(application['seeker_id'])
             if seeker:
-                # Remove sensitive data
-                seeker_data = {k: v for k, v in seeker.items() if k not in ['password_hash', 'resume_text', 'resume_vec']}
-                application['seeker'] = seeker_data
+                application['seeker'] = seeker
         
         return Response(applications, status=status.HTTP_200_OK)
         
@@ -184,16 +182,11 @@ def get_job_applications_by_id(request, job_id):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['PUT'])
+@require_role(_ROLE_RECRUITER, message='Only recruiters can update application status')
 def update_application_status(request, application_id):
     """Update application status (for recruiters)"""
     try:
-        user_id = getattr(request, 'user_id', None)
-        if not user_id:
-            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
-        
-        user = user_repo.get_by_id(user_id)
-        if not user or user['role'] != 'recruiter':
-            return Response({'error': 'Only recruiters can update application status'}, status=status.HTTP_403_FORBIDDEN)
+        user_id = request.user_id
         
         application = application_repo.get_by_id(application_id)
         if not application:
@@ -206,7 +199,7 @@ def update_application_status(request, application_id):
         data = request.data
         new_status = data.get('status')
         
-        if new_status not in ['applied', 'screening', 'shortlisted', 'interviewed', 'offered', 'rejected']:
+        if new_status not in _ALLOWED_STATUSES:
             return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
         
         update_data = {
@@ -221,13 +214,20 @@ def update_application_status(request, application_id):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _rerank_task_id(job_id: str) -> str:
+    """Celery task ID for a re-rank, carrying the job it belongs to"""
+    return f"{job_id}.{generate_uuid()}"
+
+def _rerank_task_job_id(task_id: str) -> str:
+    """Job ID carried in a re-rank task ID, or '' when there is none"""
+    return task_id.rpartition('.')[0]
+
 @api_view(['POST'])
+@require_role(_ROLE_RECRUITER, message='Only recruiters can rank candidates')
 def bulk_rank_candidates(request, job_id):
     """Re-rank all candidates for a job"""
     try:
-        user_id = getattr(request, 'user_id', None)
-        if not user_id:
-            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+        user_id = request.user_id
         
         job = job_repo.get_by_id(job_id)
         if not job:
@@ -237,46 +237,43 @@ def bulk_rank_candidates(request, job_id):
         if job['recruiter_id'] != user_id:
             return Response({'error': 'You can only rank candidates for your own jobs'}, status=status.HTTP_403_FORBIDDEN)
         
-        applications = application_repo.get_by_job(job_id)
-        
-        updated_count = 0
-        for application in applications:
-            seeker = user_repo.get_by_id(application['seeker_id'])
-            if seeker and seeker.get('resume_vec') and job.get('job_vec'):
-                # Recalculate scores
-                final_score = ranking_service.calculate_hybrid_score(
-                    resume_text=seeker.get('resume_text', ''),
-                    resume_vec=seeker['resume_vec'],
-                    job_text=f"{job['title']} {job['description']}",
-                    job_vec=job['job_vec'],
-                    resume_skills=seeker.get('skills', []),
-                    job_skills=job.get('skills_required', []),
-                    resume_exp=seeker.get('experience_years'),
-                    job_min_exp=job.get('min_exp'),
-                    same_location=(seeker.get('location', '').lower() == job.get('location', '').lower())
-                )
-                
-                scores = {
-                    'bm25': ranking_service.calculate_bm25_score(seeker.get('resume_text', ''), f"{job['title']} {job['description']}"),
-                    'semantic': ranking_service.calculate_semantic_score(seeker['resume_vec'], job['job_vec']),
-                    'rule_boost': ranking_service.calculate_rule_boost(
-                        seeker.get('skills', []), job.get('skills_required', []),
-                        seeker.get('experience_years'), job.get('min_exp'),
-                        seeker.get('location', '').lower() == job.get('location', '').lower()
-                    ),
-                    'final': final_score
-                }
-                
-                application_repo.update(application['id'], {
-                    'scores': scores,
-                    'updated_at': datetime.utcnow().isoformat()
-                })
-                updated_count += 1
+        # Re-ranking runs on a Celery worker; poll get_rerank_status for the result
+        task = rerank_job.apply_async(args=[job_id], task_id=_rerank_task_id(job_id))
         
         return Response({
-            'message': f'Re-ranked {updated_count} applications',
-            'updated_count': updated_count
-        }, status=status.HTTP_200_OK)
+            'task_id': task.id,
+            'status': 'queued'
+        }, status=status.HTTP_202_ACCEPTED)
+        
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def get_rerank_status(request, task_id):
+    """Get the status of a queued re-rank task"""
+    try:
+        user_id = getattr(request, 'user_id', None)
+        if not user_id:
+            return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        # Only the recruiter who owns the task's job may see it
+        job_id = _rerank_task_job_id(task_id)
+        job = job_repo.get_by_id(job_id) if job_id else None
+        if not job or job['recruiter_id'] != user_id:
+            return Response({'error': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        result = AsyncResult(task_id)
+        response_data = {
+            'task_id': task_id,
+            'status': result.status.lower()
+        }
+        
+        if result.successful():
+            response_data.update(result.result)
+        elif result.failed():
+            response_data['error'] = str(result.result)
+        
+        return Response(response_data, status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -8,15 +8,28 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-import json
+from elasticsearch.exceptions import ConflictError
 import hashlib
-import secrets
+import json
+import threading
+import time
+from cachetools import TTLCache
+
+from common.security import hash_password, verify_password, password_needs_rehash
+from es.repositories import user_repo, without_internal_fields
+from .decorators import current_user
+
 
-from common.security import hash_password, verify_password
-from es.repositories import UserRepository
-from common.utils import generate_uuid
+# Signing parameters resolved once at import instead of on every encode/decode;
+# the HMAC secret is pre-encoded so PyJWT does not re-encode it per token
+_SIGNING_KEY = settings.JWT_SECRET_KEY.encode('utf-8')
+_ALGORITHMS = [settings.JWT_ALGORITHM]
+_JWT = jwt.PyJWT()
 
-user_repo = UserRepository()
+# Verified payloads keyed by a digest of the token, so repeat requests with the
+# same header skip HMAC verification; failed decodes are never cached
+_DECODE_CACHE = TTLCache(maxsize=50_000, ttl=30)
+_DECODE_CACHE_LOCK = threading.Lock()
 
 def generate_jwt_token(user_data):
     """Generate JWT token for user"""
@@ -27,13 +40,28 @@ def generate_jwt_token(user_data):
         'exp': datetime.utcnow() + timedelta(seconds=settings.JWT_EXPIRATION_DELTA),
         'iat': datetime.utcnow()
     }
-    return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return _JWT.encode(payload, _SIGNING_KEY, algorithm=settings.JWT_ALGORITHM)
+
+def verify_jwt_token(token):
+    """Decode and verify JWT token, raising jwt.InvalidTokenError subclasses on failure"""
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    with _DECODE_CACHE_LOCK:
+        payload = _DECODE_CACHE.get(cache_key)
+    if payload is not None:
+        if payload['exp'] > time.time():
+            return payload
+        raise jwt.ExpiredSignatureError('Signature has expired')
+    
+    payload = _JWT.decode(token, _SIGNING_KEY, algorithms=_ALGORITHMS)
+    if 'exp' in payload:
+        with _DECODE_CACHE_LOCK:
+            _DECODE_CACHE[cache_key] = payload
+    return payload
 
 def decode_jwt_token(token):
     """Decode and verify JWT token"""
     try:
-        payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        return payload
+        return verify_jwt_token(token)
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
@@ -63,7 +91,6 @@ def register(request):
         
         # Create user
         user_data = {
-            'id': generate_uuid(),
             'email': data['email'],
             'password_hash': hash_password(data['password']),
             'full_name': data['full_name'],
@@ -76,8 +103,13 @@ def register(request):
             'updated_at': datetime.utcnow().isoformat()
         }
         
-        # Save user to Elasticsearch
-        created_user = user_repo.create(user_data)
+        # Save user to Elasticsearch; its ID comes from the email, so login and the
+        # duplicate check above find it with a realtime get, no refresh needed.
+        # A concurrent registration for the same email fails here instead of overwriting.
+        try:
+            created_user = user_repo.create(user_data)
+        except ConflictError:
+            return Response({'error': 'User with this email already exists'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Generate JWT token
         token = generate_jwt_token(created_user)
@@ -115,11 +147,15 @@ def login(request):
         if not verify_password(password, user['password_hash']):
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
         
+        # Upgrade legacy bcrypt hashes and outdated argon2 parameters on successful login
+        if password_needs_rehash(user['password_hash']):
+            user_repo.update(user['id'], {'password_hash': hash_password(password)})
+        
         # Generate JWT token
         token = generate_jwt_token(user)
         
         # Remove password hash from response
-        user_response = {k: v for k, v in user.items() if k != 'password_hash'}
+        user_response = {k: v for k, v in without_internal_fields(user).items() if k != 'password_hash'}
         
         return Response({
             'user': user_response,
@@ -143,12 +179,12 @@ def me(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
         # Remove password hash from response
-        user_response = {k: v for k, v in user.items() if k != 'password_hash'}
+        user_response = {k: v for k, v in without_internal_fields(user).items() if k != 'password_hash'}
         
         return Response(user_response, status=status.HTTP_200_OK)
         
@@ -1,20 +1,136 @@
-import json
+import orjson
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
 from datetime import datetime
+from collections import deque
 import asyncio
+import atexit
+import logging
+import threading
+import time
 
-from es.repositories import ApplicationRepository, UserRepository
+from es.repositories import ApplicationRepository, MessageRepository, user_repo
 from common.utils import generate_uuid
 
+logger = logging.getLogger(__name__)
+
+class MessageBuffer:
+    """Process-wide buffer that persists chat messages in periodic bulk writes"""
+    
+    FLUSH_INTERVAL = 1.0  # seconds
+    FLUSH_SIZE = 500
+    # Flushed messages stay readable from memory until the messages index has refreshed
+    RECENT_WINDOW = 10.0  # seconds, comfortably above the index refresh_interval
+    # Messages kept for retry while Elasticsearch is failing; the oldest are dropped beyond this
+    MAX_PENDING = 50_000
+    
+    def __init__(self):
+        self.message_repo = MessageRepository()
+        self._pending = deque()
+        self._in_flight = []  # batches taken for a bulk write that hasn't finished
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._flush_task = None
+        self._early_flushes = set()  # held so the event loop can't drop them mid-write
+    
+    async def add(self, message):
+        """Queue a message for persistence, flushing early once the batch is full"""
+        with self._lock:
+            self._pending.append(message)
+            batch_full = len(self._pending) >= self.FLUSH_SIZE
+        
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_loop())
+        
+        # The sender whose message filled the batch shouldn't wait on the bulk request
+        if batch_full:
+            task = asyncio.ensure_future(self.flush())
+            self._early_flushes.add(task)
+            task.add_done_callback(self._early_flushes.discard)
+    
+    async def flush(self):
+        """Write all pending messages in a single bulk request"""
+        batch = self._take_batch()
+        if batch:
+            # The bulk write only touches Elasticsearch, so it needn't queue on the thread-sensitive thread
+            await sync_to_async(self._write, thread_sensitive=False)(batch)
+    
+    def flush_now(self):
+        """Write all pending messages from the calling thread, for process shutdown"""
+        batch = self._take_batch()
+        if batch:
+            self._write(batch)
+    
+    def _take_batch(self):
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+            if batch:
+                self._in_flight.append(batch)
+        return batch
+    
+    def _write(self, batch):
+        """Bulk-write a batch, re-queueing messages that may succeed on a later flush"""
+        try:
+            failures = self.message_repo.bulk_create(batch)
+        except Exception as e:
+            logger.error(f"Failed to persist {len(batch)} chat messages, will retry: {e}")
+            failures = [(message, None) for message in batch]
+        
+        # Throttling, server errors and failed requests are retried; anything else is rejected for good
+        retry = [message for message, code in failures if code is None or code == 429 or code >= 500]
+        if len(retry) < len(failures):
+            logger.error(f"Elasticsearch rejected {len(failures) - len(retry)} chat messages")
+        
+        failed_ids = {message['id'] for message, _ in failures}
+        flushed_at = time.monotonic()
+        with self._lock:
+            self._in_flight = [other for other in self._in_flight if other is not batch]
+            self._recent.extend((flushed_at, message) for message in batch if message['id'] not in failed_ids)
+            self._pending.extendleft(reversed(retry))
+            overflow = len(self._pending) - self.MAX_PENDING
+            for _ in range(overflow):
+                self._pending.popleft()
+        
+        if overflow > 0:
+            logger.error(f"Dropped {overflow} unpersisted chat messages over the retry limit")
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            await self.flush()
+    
+    def get_unsearchable(self, application_id, after=None):
+        """Messages for an application that may not be visible to an index search yet"""
+        cutoff = time.monotonic() - self.RECENT_WINDOW
+        with self._lock:
+            while self._recent and self._recent[0][0] < cutoff:
+                self._recent.popleft()
+            candidates = [message for _, message in self._recent]
+            for batch in self._in_flight:
+                candidates.extend(batch)
+            candidates.extend(self._pending)
+        
+        return [
+            message for message in candidates
+            if message['application_id'] == application_id and (not after or message['timestamp'] > after)
+        ]
+
+message_buffer = MessageBuffer()
+atexit.register(message_buffer.flush_now)
+
 class ChatConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.application_repo = ApplicationRepository()
-        self.user_repo = UserRepository()
+        self.user_repo = user_repo
         self.room_group_name = None
         self.application_id = None
         self.user_id = None
+        # Snapshots taken once the connection is authorized, reused for every frame
+        self.user = None
+        self.application = None
+        self.job = None
 
     async def connect(self):
         self.application_id = self.scope['url_route']['kwargs']['application_id']
@@ -29,8 +145,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
         
         # Verify user has access to this chat
         try:
-            application = await self.get_application(self.application_id)
-            user = await self.get_user(self.user_id)
+            # Application and user are independent, so fetch them concurrently
+            application, user = await asyncio.gather(
+                self.get_application(self.application_id),
+                self.get_user(self.user_id)
+            )
             
             if not application or not user:
                 await self.close()
@@ -46,6 +165,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     await self.close()
                     return
             
+            self.user = user
+            self.application = application
+            if user['role'] == 'recruiter':
+                self.job = job
+            
             # Join room group
             await self.channel_layer.group_add(
                 self.room_group_name,
@@ -55,10 +179,10 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.accept()
             
             # Send connection confirmation
-            await self.send(text_data=json.dumps({
+            await self.send(text_data=orjson.dumps({
                 'type': 'connection',
                 'message': 'Connected to chat'
-            }))
+            }).decode())
             
         except Exception as e:
             await self.close()
@@ -70,10 +194,17 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 self.room_group_name,
                 self.channel_name
             )
+        
+        # Persist what this connection sent rather than waiting for the next timed flush
+        await message_buffer.flush()
+        
+        self.user = None
+        self.application = None
+        self.job = None
 
     async def receive(self, text_data):
         try:
-            text_data_json = json.loads(text_data)
+            text_data_json = orjson.loads(text_data)
             message_type = text_data_json.get('type')
             
             if message_type == 'chat_message':
@@ -82,8 +213,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 if not message_content:
                     return
                 
-                # Get user info
-                user = await self.get_user(self.user_id)
+                user = self.user
                 if not user:
                     return
                 
@@ -98,8 +228,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
                     'timestamp': datetime.utcnow().isoformat()
                 }
                 
-                # Store message (you might want to create a MessageRepository)
-                # For now, we'll just broadcast it
+                # Persist through the bulk buffer before broadcasting
+                await message_buffer.add(message_data)
                 
                 # Send message to room group
                 await self.channel_layer.group_send(
@@ -112,7 +242,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             
             elif message_type == 'typing':
                 # Handle typing indicators
-                user = await self.get_user(self.user_id)
+                user = self.user
                 if user:
                     await self.channel_layer.group_send(
                         self.room_group_name,
@@ -124,41 +254,43 @@ class ChatConsumer(AsyncWebsocketConsumer):
                         }
                     )
                     
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             pass
 
     async def chat_message(self, event):
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=orjson.dumps({
             'type': 'message',
             'message': event['message']
-        }))
+        }).decode())
 
     async def typing_indicator(self, event):
         # Don't send typing indicator back to the sender
         if event['user_id'] != self.user_id:
-            await self.send(text_data=json.dumps({
+            await self.send(text_data=orjson.dumps({
                 'type': 'typing',
                 'user_id': event['user_id'],
                 'user_name': event['user_name'],
                 'is_typing': event['is_typing']
-            }))
+            }).decode())
 
-    @database_sync_to_async
+    # Lookups only hit Elasticsearch (no Django ORM), so they may run on any
+    # worker thread rather than the single thread-sensitive one
+    @sync_to_async(thread_sensitive=False)
     def get_application(self, application_id):
         try:
             return self.application_repo.get_by_id(application_id)
         except:
             return None
 
-    @database_sync_to_async
+    @sync_to_async(thread_sensitive=False)
     def get_user(self, user_id):
         try:
             return self.user_repo.get_by_id(user_id)
         except:
             return None
 
-    @database_sync_to_async
+    @sync_to_async(thread_sensitive=False)
     def get_job(self, job_id):
         try:
             from es.repositories import JobRepository
@@ -188,6 +320,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from .decorators import current_user
 
 @api_view(['GET'])
 def get_chat_history(request, application_id):
@@ -199,13 +332,12 @@ def get_chat_history(request, application_id):
         
         # Verify user has access to this chat
         application_repo = ApplicationRepository()
-        user_repo = UserRepository()
         
         application = application_repo.get_by_id(application_id)
         if not application:
             return Response({'error': 'Application not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -219,10 +351,22 @@ def get_chat_history(request, application_id):
             if not job or job['recruiter_id'] != user_id:
                 return Response({'error': 'Access denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        # For now, return empty chat history
-        # In a real implementation, you'd have a MessageRepository
+        # Only return messages newer than this timestamp when given (incremental polling)
+        after = request.GET.get('after')
+        
+        message_repo = MessageRepository()
+        messages = message_repo.get_by_application(application_id, after=after)
+        
+        # Merge in messages still buffered or awaiting an index refresh
+        seen_ids = {message['id'] for message in messages}
+        for message in message_buffer.get_unsearchable(application_id, after=after):
+            if message['id'] not in seen_ids:
+                messages.append(message)
+                seen_ids.add(message['id'])
+        messages.sort(key=lambda message: message['timestamp'])
+        
         return Response({
-            'messages': [],
+            'messages': messages,
             'application_id': application_id
         }, status=status.HTTP_200_OK)
         
@@ -0,0 +1,45 @@
+from functools import wraps
+
+from rest_framework.response import Response
+from rest_framework import status
+
+from es.repositories import user_repo
+
+
+def current_user(request):
+    """Return the authenticated user's document, looked up at most once per request.
+    
+    JWTAuthenticationMiddleware already loads the user into request.user_data;
+    otherwise the first lookup is memoized on the request.
+    """
+    user = getattr(request, 'user_data', None)
+    if user is None:
+        user = user_repo.get_by_id(request.user_id)
+        request.user_data = user
+    return user
+
+def require_role(*roles, message='You do not have permission to perform this action'):
+    """Reject unauthenticated requests and users whose role is not one of roles.
+    
+    The authenticated user's document is attached to the request as request.user_obj.
+    Apply below @api_view so the wrapped view receives the DRF request.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            user_id = getattr(request, 'user_id', None)
+            if not user_id:
+                return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
+            
+            try:
+                user = current_user(request)
+            except Exception as e:
+                return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            
+            if not user or (roles and user['role'] not in roles):
+                return Response({'error': message}, status=status.HTTP_403_FORBIDDEN)
+            
+            request.user_obj = user
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -5,23 +5,93 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from datetime import datetime, timedelta
+from elasticsearch.exceptions import ConflictError
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
 import json
-import uuid
+import secrets
+import sys
 
-from es.repositories import InterviewRepository, ApplicationRepository, JobRepository, UserRepository
+from es.repositories import InterviewRepository, ApplicationRepository, JobRepository, user_repo
 from common.utils import generate_uuid
+from .decorators import current_user
 
 interview_repo = InterviewRepository()
 application_repo = ApplicationRepository()
 job_repo = JobRepository()
-user_repo = UserRepository()
+
+# Shared pool for overlapping independent Elasticsearch lookups within a request
+_lookup_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='interview-lookup')
+
+# Slots are offered on the hour from 9 AM to 5 PM (business hours)
+_BUSINESS_HOURS = tuple(time(hour) for hour in range(9, 17))
+_SLOT_LENGTH = timedelta(hours=1)
+_ONE_DAY = timedelta(days=1)
+_MAX_INTERVIEW_DURATION = timedelta(hours=4)
+
+_REQUIRED_FIELDS = ('job_id', 'seeker_id', 'start_time', 'end_time')
+# Application statuses that move to 'interviewed' once an interview is scheduled
+_INTERVIEWABLE_STATUSES = frozenset(('applied', 'screening', 'shortlisted'))
+_VALID_INTERVIEW_STATUSES = frozenset(('scheduled', 'rescheduled', 'cancelled', 'completed'))
+_RECRUITER_PLAIN_FIELDS = ('meeting_link', 'status', 'notes')
+_RECRUITER_DATETIME_FIELDS = ('start_time', 'end_time')
+
+# datetime.fromisoformat accepts a trailing 'Z' from Python 3.11 on
+_FROMISOFORMAT_ACCEPTS_Z = sys.version_info >= (3, 11)
+
+def parse_datetime(value):
+    """Parse an ISO 8601 timestamp, including the 'Z' UTC suffix sent by browsers"""
+    if not _FROMISOFORMAT_ACCEPTS_Z and value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+class InvalidFieldError(ValueError):
+    """A submitted field value could not be parsed"""
+    
+    def __init__(self, field):
+        super().__init__(f'Invalid {field} format')
+        self.field = field
+
+def _recruiter_updates(data):
+    """Fields a recruiter may change on their interview"""
+    updates = {field: data[field] for field in _RECRUITER_PLAIN_FIELDS if field in data}
+    for field in _RECRUITER_DATETIME_FIELDS:
+        if field in data:
+            try:
+                updates[field] = parse_datetime(data[field]).isoformat()
+            except ValueError:
+                raise InvalidFieldError(field)
+    return updates
+
+def _seeker_updates(data):
+    """Fields a job seeker may change on their interview (status only, e.g. to reschedule)"""
+    return {'status': data['status']} if 'status' in data else {}
+
+_UPDATE_BUILDERS = {
+    'recruiter': _recruiter_updates,
+    'seeker': _seeker_updates,
+}
 
 def generate_meeting_link():
     """Generate a meeting link (placeholder - integrate with actual video service)"""
-    meeting_id = str(uuid.uuid4())[:8]
+    meeting_id = secrets.token_urlsafe(6)
     return f"https://meet.example.com/{meeting_id}"
 
+def find_free_slots(slots, busy_intervals):
+    """Yield slots that overlap no busy interval; both inputs must be sorted by start time"""
+    index = 0
+    latest_end = None
+    for slot_start, slot_end in slots:
+        # Every interval starting before this slot ends is a candidate; only the latest end matters
+        while index < len(busy_intervals) and busy_intervals[index][0] < slot_end:
+            interval_end = busy_intervals[index][1]
+            if latest_end is None or interval_end > latest_end:
+                latest_end = interval_end
+            index += 1
+        
+        if latest_end is None or latest_end <= slot_start:
+            yield slot_start, slot_end
+
 @api_view(['POST'])
 def schedule_interview(request):
     """Schedule an interview"""
@@ -30,15 +100,14 @@ def schedule_interview(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user or user['role'] != 'recruiter':
             return Response({'error': 'Only recruiters can schedule interviews'}, status=status.HTTP_403_FORBIDDEN)
         
         data = request.data
         
         # Validate required fields
-        required_fields = ['job_id', 'seeker_id', 'start_time', 'end_time']
-        for field in required_fields:
+        for field in _REQUIRED_FIELDS:
             if not data.get(field):
                 return Response({'error': f'{field} is required'}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -65,8 +134,8 @@ def schedule_interview(request):
         
         # Validate datetime format
         try:
-            start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
-            end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
+            start_time = parse_datetime(data['start_time'])
+            end_time = parse_datetime(data['end_time'])
         except ValueError:
             return Response({'error': 'Invalid datetime format'}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -75,7 +144,7 @@ def schedule_interview(request):
             return Response({'error': 'End time must be after start time'}, status=status.HTTP_400_BAD_REQUEST)
         
         duration = end_time - start_time
-        if duration > timedelta(hours=4):
+        if duration > _MAX_INTERVIEW_DURATION:
             return Response({'error': 'Interview duration cannot exceed 4 hours'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Generate meeting link
@@ -87,8 +156,9 @@ def schedule_interview(request):
             'job_id': job_id,
             'seeker_id': seeker_id,
             'recruiter_id': user_id,
-            'start_time': start_time.isoformat(),
-            'end_time': end_time.isoformat(),
+            # Serialized as ISO 8601 by the Elasticsearch client and the orjson renderer
+            'start_time': start_time,
+            'end_time': end_time,
             'meeting_link': meeting_link,
             'status': 'scheduled',
             'notes': data.get('notes', '')
@@ -97,7 +167,7 @@ def schedule_interview(request):
         created_interview = interview_repo.create(interview_data)
         
         # Update application status to interviewed if it's not already
-        if application['status'] in ['applied', 'screening', 'shortlisted']:
+        if application['status'] in _INTERVIEWABLE_STATUSES:
             application_repo.update(application['id'], {
                 'status': 'interviewed',
                 'updated_at': datetime.utcnow().isoformat()
@@ -116,7 +186,7 @@ def get_my_interviews(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -127,24 +197,21 @@ def get_my_interviews(request):
         else:
             return Response({'error': 'Invalid user role'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Enrich with additional data
+        # Enrich with additional data, fetching each related index in one round trip; both run concurrently
+        peer_field = 'seeker_id' if user['role'] == 'recruiter' else 'recruiter_id'
+        peer_key = 'seeker' if user['role'] == 'recruiter' else 'recruiter'
+        jobs_future = _lookup_executor.submit(job_repo.get_many_summaries, [interview['job_id'] for interview in interviews])
+        peers = user_repo.get_many_public(interview[peer_field] for interview in interviews)
+        jobs = jobs_future.result()
+        
         for interview in interviews:
-            job = job_repo.get_by_id(interview['job_id'])
+            job = jobs.get(interview['job_id'])
             if job:
                 interview['job'] = job
             
-            if user['role'] == 'recruiter':
-                seeker = user_repo.get_by_id(interview['seeker_id'])
-                if seeker:
-                    # Remove sensitive data
-                    seeker_data = {k: v for k, v in seeker.items() if k not in ['password_hash', 'resume_text', 'resume_vec']}
-                    interview['seeker'] = seeker_data
-            else:
-                recruiter = user_repo.get_by_id(interview['recruiter_id'])
-                if recruiter:
-                    # Remove sensitive data
-                    recruiter_data = {k: v for k, v in recruiter.items() if k not in ['password_hash']}
-                    interview['recruiter'] = recruiter_data
+            peer = peers.get(interview[peer_field])
+            if peer:
+                interview[peer_key] = peer
         
         return Response(interviews, status=status.HTTP_200_OK)
         
@@ -159,11 +226,11 @@ def update_interview(request, interview_id):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        interview = interview_repo.get_by_id(interview_id)
+        interview, seq_no, primary_term = interview_repo.get_with_version(interview_id)
         if not interview:
             return Response({'error': 'Interview not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         
         # Only recruiter who created interview or the seeker can update it
         if user['role'] == 'recruiter':
@@ -175,37 +242,25 @@ def update_interview(request, interview_id):
         else:
             return Response({'error': 'Invalid user role'}, status=status.HTTP_403_FORBIDDEN)
         
-        data = request.data
-        update_data = {}
-        
         # Update allowed fields based on user role
-        if user['role'] == 'recruiter':
-            allowed_fields = ['start_time', 'end_time', 'meeting_link', 'status', 'notes']
-        else:
-            allowed_fields = ['status']  # Job seekers can only update status (e.g., to reschedule)
-        
-        for field in allowed_fields:
-            if field in data:
-                if field in ['start_time', 'end_time']:
-                    try:
-                        update_data[field] = datetime.fromisoformat(data[field].replace('Z', '+00:00')).isoformat()
-                    except ValueError:
-                        return Response({'error': f'Invalid {field} format'}, status=status.HTTP_400_BAD_REQUEST)
-                else:
-                    update_data[field] = data[field]
+        try:
+            update_data = _UPDATE_BUILDERS[user['role']](request.data)
+        except InvalidFieldError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Validate status
         if 'status' in update_data:
-            valid_statuses = ['scheduled', 'rescheduled', 'cancelled', 'completed']
-            if update_data['status'] not in valid_statuses:
+            if update_data['status'] not in _VALID_INTERVIEW_STATUSES:
                 return Response({'error': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
         
         if update_data:
-            updated_interview = interview_repo.update(interview_id, update_data)
+            updated_interview = interview_repo.update(interview_id, update_data, seq_no, primary_term)
             return Response(updated_interview, status=status.HTTP_200_OK)
         
         return Response({'message': 'No fields to update'}, status=status.HTTP_400_BAD_REQUEST)
         
+    except ConflictError:
+        return Response({'error': 'Interview was modified by another request, please reload and retry'}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -217,11 +272,11 @@ def cancel_interview(request, interview_id):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        interview = interview_repo.get_by_id(interview_id)
+        interview, seq_no, primary_term = interview_repo.get_with_version(interview_id)
         if not interview:
             return Response({'error': 'Interview not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         
         # Only recruiter who created interview or the seeker can cancel it
         if user['role'] == 'recruiter':
@@ -236,10 +291,12 @@ def cancel_interview(request, interview_id):
         # Update status to cancelled instead of deleting
         updated_interview = interview_repo.update(interview_id, {
             'status': 'cancelled'
-        })
+        }, seq_no, primary_term)
         
         return Response({'message': 'Interview cancelled successfully'}, status=status.HTTP_200_OK)
         
+    except ConflictError:
+        return Response({'error': 'Interview was modified by another request, please reload and retry'}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -251,7 +308,7 @@ def get_interview_availability(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -268,40 +325,35 @@ def get_interview_availability(request):
         except ValueError:
             return Response({'error': 'Invalid date format'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get user's interviews in the date range
-        if user['role'] == 'recruiter':
-            interviews = interview_repo.get_by_recruiter_and_date_range(user_id, start_dt, end_dt)
-        else:
-            interviews = interview_repo.get_by_seeker_and_date_range(user_id, start_dt, end_dt)
-        
-        # Filter out cancelled interviews
-        active_interviews = [i for i in interviews if i['status'] != 'cancelled']
-        
-        # Generate available slots (this is a simplified version)
-        available_slots = []
-        current_date = start_dt.date()
-        end_date = end_dt.date()
-        
-        while current_date <= end_date:
-            # Generate slots from 9 AM to 5 PM (business hours)
-            for hour in range(9, 17):
-                slot_start = datetime.combine(current_date, datetime.min.time().replace(hour=hour))
-                slot_end = slot_start + timedelta(hours=1)
-                
-                # Check if slot conflicts with existing interviews
-                has_conflict = any(
-                    datetime.fromisoformat(interview['start_time']) < slot_end and
-                    datetime.fromisoformat(interview['end_time']) > slot_start
-                    for interview in active_interviews
-                )
-                
-                if not has_conflict:
-                    available_slots.append({
-                        'start_time': slot_start.isoformat(),
-                        'end_time': slot_end.isoformat()
-                    })
-            
-            current_date += timedelta(days=1)
+        # Generate business-hour slots, already in chronological order
+        first_day = start_dt.date()
+        days = [first_day + _ONE_DAY * offset for offset in range((end_dt.date() - first_day).days + 1)]
+        slots = [
+            (slot_start, slot_start + _SLOT_LENGTH)
+            for slot_start in (datetime.combine(day, slot_time) for day in days for slot_time in _BUSINESS_HOURS)
+        ]
+        
+        # Get the user's interviews overlapping those days; Elasticsearch drops cancelled ones
+        user_field = 'recruiter_id' if user['role'] == 'recruiter' else 'seeker_id'
+        active_interviews = interview_repo.get_busy_intervals(
+            user_field, user_id,
+            datetime.combine(first_day, time()),
+            datetime.combine(days[-1] + _ONE_DAY, time()) if days else start_dt
+        )
+        
+        # Parse each interview once, sorted by start time for a single sweep
+        busy_intervals = sorted(
+            (datetime.fromisoformat(interview['start_time']), datetime.fromisoformat(interview['end_time']))
+            for interview in active_interviews
+        )
+        
+        # Datetimes are rendered as ISO 8601 by the orjson renderer
+        available_slots = [
+            {
+                'start_time': slot_start,
+                'end_time': slot_end
+            } for slot_start, slot_end in find_free_slots(slots, busy_intervals)
+        ]
         
         return Response({
             'available_slots': available_slots,
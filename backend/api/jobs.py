@@ -5,18 +5,25 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from elasticsearch.exceptions import ConflictError
 from datetime import datetime
+import heapq
 import json
 
-from es.repositories import JobRepository, UserRepository
-from ml.embeddings import EmbeddingGenerator
-from ml.ranking import RankingService
-from common.utils import generate_uuid
+from es.repositories import JobRepository, without_internal_fields
+from ml.embeddings import get_embedding_batcher
+from ml.ranking import ranking_service
+from common.utils import generate_uuid, content_hash
+from .decorators import current_user
 
 job_repo = JobRepository()
-user_repo = UserRepository()
-embedding_generator = EmbeddingGenerator()
-ranking_service = RankingService()
+
+# Nearest jobs fetched by vector search before hybrid re-ranking
+RECOMMENDATION_CANDIDATES = 50
+
+def build_job_text(title, description, skills_required):
+    """Text a job's embedding is generated from"""
+    return f"{title} {description} {' '.join(skills_required)}"
 
 @api_view(['POST'])
 def create_job(request):
@@ -26,7 +33,7 @@ def create_job(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user or user['role'] != 'recruiter':
             return Response({'error': 'Only recruiters can create jobs'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -39,8 +46,8 @@ def create_job(request):
                 return Response({'error': f'{field} is required'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Create job text for embedding
-        job_text = f"{data['title']} {data['description']} {' '.join(data.get('skills_required', []))}"
-        job_embedding = embedding_generator.generate_embedding(job_text)
+        job_text = build_job_text(data['title'], data['description'], data.get('skills_required', []))
+        job_embedding = get_embedding_batcher().embed(job_text)
         
         # Create job data
         job_data = {
@@ -54,6 +61,7 @@ def create_job(request):
             'location': data.get('location', ''),
             'employment_type': data.get('employment_type', 'full-time'),
             'job_vec': job_embedding,
+            'job_text_hash': content_hash(job_text),
             'created_at': datetime.utcnow().isoformat(),
             'status': 'open'
         }
@@ -74,7 +82,7 @@ def get_jobs(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user or user['role'] != 'recruiter':
             return Response({'error': 'Only recruiters can view their jobs'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -92,7 +100,7 @@ def search_jobs(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user or user['role'] != 'seeker':
             return Response({'error': 'Only job seekers can search jobs'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -109,23 +117,11 @@ def search_jobs(request):
         
         # If user has resume, calculate match scores
         if user.get('resume_vec'):
-            for job in jobs:
-                if job.get('job_vec'):
-                    # Calculate hybrid score
-                    score = ranking_service.calculate_hybrid_score(
-                        resume_text=user.get('resume_text', ''),
-                        resume_vec=user['resume_vec'],
-                        job_text=f"{job['title']} {job['description']}",
-                        job_vec=job['job_vec'],
-                        resume_skills=user.get('skills', []),
-                        job_skills=job.get('skills_required', []),
-                        resume_exp=user.get('experience_years'),
-                        job_min_exp=job.get('min_exp'),
-                        same_location=(user.get('location', '').lower() == job.get('location', '').lower())
-                    )
-                    job['matchScore'] = score * 100  # Convert to percentage
+            vector_jobs = [job for job in jobs if job.get('job_vec')]
+            for job, scores in zip(vector_jobs, ranking_service.bulk_score_jobs(user, vector_jobs)):
+                job['matchScore'] = scores['final'] * 100  # Convert to percentage
         
-        return Response(jobs, status=status.HTTP_200_OK)
+        return Response([without_internal_fields(job) for job in jobs], status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -138,38 +134,22 @@ def get_recommendations(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user or user['role'] != 'seeker':
             return Response({'error': 'Only job seekers can get recommendations'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get all open jobs
-        jobs = job_repo.get_open_jobs()
-        
-        # If user has resume, calculate match scores and sort by relevance
+        # If user has resume, re-rank the nearest open jobs by hybrid score
         if user.get('resume_vec'):
-            scored_jobs = []
-            for job in jobs:
-                if job.get('job_vec'):
-                    # Calculate hybrid score
-                    score = ranking_service.calculate_hybrid_score(
-                        resume_text=user.get('resume_text', ''),
-                        resume_vec=user['resume_vec'],
-                        job_text=f"{job['title']} {job['description']}",
-                        job_vec=job['job_vec'],
-                        resume_skills=user.get('skills', []),
-                        job_skills=job.get('skills_required', []),
-                        resume_exp=user.get('experience_years'),
-                        job_min_exp=job.get('min_exp'),
-                        same_location=(user.get('location', '').lower() == job.get('location', '').lower())
-                    )
-                    job['matchScore'] = score * 100  # Convert to percentage
-                    scored_jobs.append(job)
+            scored_jobs = job_repo.knn_open_jobs(user['resume_vec'], k=RECOMMENDATION_CANDIDATES)
+            for job, scores in zip(scored_jobs, ranking_service.bulk_score_jobs(user, scored_jobs)):
+                job['matchScore'] = scores['final'] * 100  # Convert to percentage
             
-            # Sort by match score and return top recommendations
-            scored_jobs.sort(key=lambda x: x.get('matchScore', 0), reverse=True)
-            return Response(scored_jobs[:10], status=status.HTTP_200_OK)
+            # Return the top recommendations by match score
+            top_jobs = heapq.nlargest(10, scored_jobs, key=lambda x: x.get('matchScore', 0))
+            return Response([without_internal_fields(job) for job in top_jobs], status=status.HTTP_200_OK)
         else:
             # Return recent jobs if no resume
+            jobs = job_repo.get_open_jobs()
             return Response(jobs[:10], status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -183,7 +163,7 @@ def update_job(request, job_id):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        job = job_repo.get_by_id(job_id)
+        job, seq_no, primary_term = job_repo.get_with_version(job_id)
         if not job:
             return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -201,17 +181,26 @@ def update_job(request, job_id):
             if field in data:
                 update_data[field] = data[field]
         
-        # If job content changed, regenerate embedding
+        # Regenerate the embedding only if the text it is built from actually changed
         if any(field in update_data for field in ['title', 'description', 'skills_required']):
-            job_text = f"{update_data.get('title', job['title'])} {update_data.get('description', job['description'])} {' '.join(update_data.get('skills_required', job.get('skills_required', [])))}"
-            update_data['job_vec'] = embedding_generator.generate_embedding(job_text)
+            job_text = build_job_text(
+                update_data.get('title', job['title']),
+                update_data.get('description', job['description']),
+                update_data.get('skills_required', job.get('skills_required', []))
+            )
+            job_text_hash = content_hash(job_text)
+            if job_text_hash != job.get('job_text_hash'):
+                update_data['job_vec'] = get_embedding_batcher().embed(job_text)
+                update_data['job_text_hash'] = job_text_hash
         
         if update_data:
-            updated_job = job_repo.update(job_id, update_data)
+            updated_job = job_repo.update(job_id, update_data, seq_no, primary_term)
             return Response(updated_job, status=status.HTTP_200_OK)
         
         return Response({'message': 'No fields to update'}, status=status.HTTP_400_BAD_REQUEST)
         
+    except ConflictError:
+        return Response({'error': 'Job was modified by another request, please reload and retry'}, status=status.HTTP_409_CONFLICT)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
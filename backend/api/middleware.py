@@ -2,26 +2,40 @@ import jwt
 from django.conf import settings
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
-from es.repositories import UserRepository
+import redis
+from es.repositories import user_repo
+from .auth import verify_jwt_token
 import logging
+import secrets
+import threading
+from array import array
+from collections import OrderedDict
 
 logger = logging.getLogger(__name__)
 
+class RequestClassifyMiddleware(MiddlewareMixin):
+    """Classify the request path once for the middleware below it; install it first"""
+    
+    def process_request(self, request):
+        request._is_api = request.path.startswith('/api/')
+        request._is_auth = request._is_api and request.path.startswith('/api/auth/')
+        return None
+
 class JWTAuthenticationMiddleware(MiddlewareMixin):
     """Middleware to handle JWT authentication for API requests"""
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self.user_repo = UserRepository()
+        self.user_repo = user_repo
         super().__init__(get_response)
     
     def process_request(self, request):
         # Skip authentication for auth endpoints
-        if request.path.startswith('/api/auth/'):
+        if request._is_auth:
             return None
         
         # Skip authentication for non-API requests
-        if not request.path.startswith('/api/'):
+        if not request._is_api:
             return None
         
         # Skip authentication for OPTIONS requests (CORS preflight)
@@ -35,18 +49,18 @@ class JWTAuthenticationMiddleware(MiddlewareMixin):
             return JsonResponse({'error': 'Authentication required'}, status=401)
         
         # Extract token
-        token = auth_header.split(' ')[1]
+        token = auth_header[7:].strip()
         
         try:
-            # Decode JWT token
-            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+            # Decode JWT token (verified payloads are cached briefly per token)
+            payload = verify_jwt_token(token)
             user_id = payload.get('user_id')
             
             if not user_id:
                 return JsonResponse({'error': 'Invalid token'}, status=401)
             
-            # Get user from Elasticsearch
-            user = self.user_repo.get_by_id(user_id)
+            # Get user from the short-lived cache, or from an mget shared with concurrent requests
+            user = self.user_repo.get_by_id_coalesced(user_id)
             if not user:
                 return JsonResponse({'error': 'User not found'}, status=401)
             
@@ -65,21 +79,28 @@ class JWTAuthenticationMiddleware(MiddlewareMixin):
         
         return None
 
+_LOCAL_ORIGINS = ('http://localhost', 'http://127.0.0.1')
+
+_CORS_HEADERS = {
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-Requested-With',
+    'Access-Control-Allow-Credentials': 'true',
+    'Access-Control-Max-Age': '86400',  # 24 hours
+}
+
 class CORSMiddleware(MiddlewareMixin):
     """Middleware to handle CORS headers"""
     
     def process_response(self, request, response):
         # Allow requests from the frontend
         origin = request.META.get('HTTP_ORIGIN')
-        if origin and (origin.startswith('http://localhost') or origin.startswith('http://127.0.0.1')):
+        if origin and origin.startswith(_LOCAL_ORIGINS):
             response['Access-Control-Allow-Origin'] = origin
         elif settings.DEBUG:
             response['Access-Control-Allow-Origin'] = '*'
         
-        response['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-        response['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, X-Requested-With'
-        response['Access-Control-Allow-Credentials'] = 'true'
-        response['Access-Control-Max-Age'] = '86400'  # 24 hours
+        for header, value in _CORS_HEADERS.items():
+            response[header] = value
         
         return response
 
@@ -87,72 +108,150 @@ class RequestLoggingMiddleware(MiddlewareMixin):
     """Middleware to log API requests"""
     
     def process_request(self, request):
-        if request.path.startswith('/api/') and settings.DEBUG:
+        if request._is_api and settings.DEBUG:
             user_id = getattr(request, 'user_id', 'Anonymous')
             logger.info(f"{request.method} {request.path} - User: {user_id}")
         return None
     
     def process_response(self, request, response):
-        if request.path.startswith('/api/') and settings.DEBUG:
+        if request._is_api and settings.DEBUG:
             user_id = getattr(request, 'user_id', 'Anonymous')
             logger.info(f"{request.method} {request.path} - {response.status_code} - User: {user_id}")
         return response
 
+_SECURITY_HEADERS = {
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'X-XSS-Protection': '1; mode=block',
+    'Referrer-Policy': 'strict-origin-when-cross-origin',
+}
+
+# Security headers plus a Content Security Policy for API responses
+_API_SECURITY_HEADERS = {
+    **_SECURITY_HEADERS,
+    'Content-Security-Policy': "default-src 'none'; frame-ancestors 'none';",
+}
+
 class SecurityHeadersMiddleware(MiddlewareMixin):
     """Middleware to add security headers"""
     
     def process_response(self, request, response):
-        # Security headers
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['X-XSS-Protection'] = '1; mode=block'
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
-        # Content Security Policy for API responses
-        if request.path.startswith('/api/'):
-            response['Content-Security-Policy'] = "default-src 'none'; frame-ancestors 'none';"
+        headers = _API_SECURITY_HEADERS if request._is_api else _SECURITY_HEADERS
+        for header, value in headers.items():
+            response[header] = value
         
         return response
 
+# Sliding-window log per client: drop entries older than the window, then
+# admit and record the request only if the remaining count is under the limit
+_RATE_LIMIT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, tonumber(ARGV[1]) - tonumber(ARGV[2]))
+local count = redis.call('ZCARD', KEYS[1])
+if count < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[2])))
+    return {1, count + 1}
+end
+return {0, count}
+"""
+
+class BucketCounter:
+    """Request count over a rolling window, kept as a ring of fixed-width time buckets"""
+    
+    BUCKETS = 60
+    
+    def __init__(self, window):
+        self.bucket_width = window / self.BUCKETS
+        self.buckets = array('I', bytes(4 * self.BUCKETS))
+        self.last_bucket = None
+    
+    def try_add(self, current_time, limit):
+        """Record one request unless the window already holds limit requests"""
+        bucket = int(current_time // self.bucket_width)
+        if self.last_bucket is None or bucket - self.last_bucket >= self.BUCKETS:
+            self.buckets = array('I', bytes(4 * self.BUCKETS))
+            self.last_bucket = bucket
+        elif bucket > self.last_bucket:
+            # Zero the buckets that rotated out since the last request
+            for stale in range(self.last_bucket + 1, bucket + 1):
+                self.buckets[stale % self.BUCKETS] = 0
+            self.last_bucket = bucket
+        
+        if sum(self.buckets) >= limit:
+            return False
+        self.buckets[bucket % self.BUCKETS] += 1
+        return True
+
 class RateLimitMiddleware(MiddlewareMixin):
-    """Basic rate limiting middleware"""
+    """Sliding-window rate limiting, shared across workers through Redis when configured"""
+    
+    MAX_TRACKED_CLIENTS = 10_000
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self.requests = {}  # In production, use Redis or database
+        self.requests = OrderedDict()  # Per-process fallback when RATE_LIMIT_REDIS_URL is not set
+        self._lock = threading.Lock()
+        self.redis = None
+        self.rate_limit_script = None
+        if settings.RATE_LIMIT_REDIS_URL:
+            self.redis = redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+            self.rate_limit_script = self.redis.register_script(_RATE_LIMIT_SCRIPT)
         super().__init__(get_response)
     
     def process_request(self, request):
         if not settings.RATE_LIMIT_ENABLED:
             return None
         
-        if not request.path.startswith('/api/'):
+        if not request._is_api:
             return None
         
         # Get client IP
         ip = self.get_client_ip(request)
         current_time = time.time()
         
-        # Clean old entries
-        self.cleanup_old_requests(current_time)
-        
-        # Check rate limit
-        if ip in self.requests:
-            request_times = self.requests[ip]
-            recent_requests = [t for t in request_times if current_time - t < settings.RATE_LIMIT_WINDOW]
-            
-            if len(recent_requests) >= settings.RATE_LIMIT_REQUESTS:
-                return JsonResponse({
-                    'error': 'Rate limit exceeded',
-                    'retry_after': settings.RATE_LIMIT_WINDOW
-                }, status=429)
-            
-            self.requests[ip] = recent_requests + [current_time]
+        if self.redis is not None:
+            allowed = self.is_allowed_redis(ip, current_time)
         else:
-            self.requests[ip] = [current_time]
+            allowed = self.is_allowed_local(ip, current_time)
+        
+        if not allowed:
+            return JsonResponse({
+                'error': 'Rate limit exceeded',
+                'retry_after': settings.RATE_LIMIT_WINDOW
+            }, status=429)
         
         return None
     
+    def is_allowed_redis(self, ip, current_time):
+        """Count and record the request atomically in a Redis sorted set"""
+        # Unique member so simultaneous requests from one IP are all counted
+        member = f"{current_time:.6f}:{secrets.token_hex(4)}"
+        try:
+            allowed, _ = self.rate_limit_script(
+                keys=[f"rl:{ip}"],
+                args=[current_time, settings.RATE_LIMIT_WINDOW, settings.RATE_LIMIT_REQUESTS, member]
+            )
+        except redis.RedisError as e:
+            # Fail open rather than rejecting all traffic while Redis is unavailable
+            logger.error(f"Rate limit check failed: {e}")
+            return True
+        return bool(allowed)
+    
+    def is_allowed_local(self, ip, current_time):
+        """Count and record the request in this process's memory"""
+        # The middleware instance is shared by every request thread
+        with self._lock:
+            counter = self.requests.get(ip)
+            if counter is None:
+                counter = self.requests[ip] = BucketCounter(settings.RATE_LIMIT_WINDOW)
+                # Evict the least recently seen clients instead of sweeping every entry
+                while len(self.requests) > self.MAX_TRACKED_CLIENTS:
+                    self.requests.popitem(last=False)
+            else:
+                self.requests.move_to_end(ip)
+            
+            return counter.try_add(current_time, settings.RATE_LIMIT_REQUESTS)
+    
     def get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -160,18 +259,12 @@ class RateLimitMiddleware(MiddlewareMixin):
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
-    
-    def cleanup_old_requests(self, current_time):
-        for ip in list(self.requests.keys()):
-            self.requests[ip] = [t for t in self.requests[ip] if current_time - t < settings.RATE_LIMIT_WINDOW]
-            if not self.requests[ip]:
-                del self.requests[ip]
 
 class ErrorHandlingMiddleware(MiddlewareMixin):
     """Middleware to handle and log errors"""
     
     def process_exception(self, request, exception):
-        if request.path.startswith('/api/'):
+        if request._is_api:
             logger.error(f"API Error: {exception}", exc_info=True)
             
             if settings.DEBUG:
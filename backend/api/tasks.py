@@ -0,0 +1,76 @@
+from celery import chord, shared_task
+from datetime import datetime
+from elasticsearch.exceptions import ConnectionError as ESConnectionError, ConnectionTimeout
+
+from es.repositories import ApplicationRepository, JobRepository, user_repo
+from ml.ranking import ranking_service
+
+application_repo = ApplicationRepository()
+job_repo = JobRepository()
+
+# Applications scored per worker task; larger jobs are fanned out across workers
+RERANK_CHUNK_SIZE = 200
+
+# Transient Elasticsearch failures worth retrying; the builtin ConnectionError never matches these
+_RETRYABLE_ERRORS = (ESConnectionError, ConnectionTimeout)
+
+def _score_and_store(job, application_pairs):
+    """Score (application_id, seeker_id) pairs against a job and bulk-write the results"""
+    if not job.get('job_vec'):
+        return 0
+    
+    seekers = user_repo.get_many(seeker_id for _, seeker_id in application_pairs)
+    
+    # Only applicants with an embedded resume can be scored
+    rankable = []
+    for application_id, seeker_id in application_pairs:
+        seeker = seekers.get(seeker_id)
+        if seeker and seeker.get('resume_vec'):
+            rankable.append((application_id, seeker))
+    
+    # Recalculate scores for the whole batch at once, on the same scale as apply-time scores
+    all_scores = ranking_service.bulk_score(job, [seeker for _, seeker in rankable])
+    
+    # Write all new scores back in a single bulk request
+    updated_at = datetime.utcnow().isoformat()
+    return application_repo.bulk_update([
+        (application_id, {'scores': scores, 'updated_at': updated_at})
+        for (application_id, _), scores in zip(rankable, all_scores)
+    ])
+
+@shared_task(bind=True, autoretry_for=_RETRYABLE_ERRORS, retry_backoff=True, max_retries=3)
+def rerank_job(self, job_id):
+    """Recalculate and store match scores for every application to a job"""
+    job = job_repo.get_by_id(job_id)
+    if not job:
+        return {'job_id': job_id, 'updated_count': 0}
+    
+    # Page through every application; only the ids are needed to fan out the scoring
+    applications = application_repo.iter_by_job(job_id, fields=['id', 'seeker_id'])
+    application_pairs = [(application['id'], application['seeker_id']) for application in applications]
+    
+    if len(application_pairs) <= RERANK_CHUNK_SIZE:
+        return {'job_id': job_id, 'updated_count': _score_and_store(job, application_pairs)}
+    
+    # Score chunks in parallel on the worker pool and sum the counts once all have finished
+    chunks = [
+        application_pairs[i:i + RERANK_CHUNK_SIZE]
+        for i in range(0, len(application_pairs), RERANK_CHUNK_SIZE)
+    ]
+    return self.replace(chord(
+        (score_applications_chunk.s(job_id, chunk) for chunk in chunks),
+        summarize_rerank.s(job_id)
+    ))
+
+@shared_task(autoretry_for=_RETRYABLE_ERRORS, retry_backoff=True, max_retries=3)
+def score_applications_chunk(job_id, application_pairs):
+    """Score one chunk of a job's applications"""
+    job = job_repo.get_by_id(job_id)
+    if not job:
+        return 0
+    return _score_and_store(job, application_pairs)
+
+@shared_task
+def summarize_rerank(chunk_counts, job_id):
+    """Combine per-chunk update counts into the re-rank task result"""
+    return {'job_id': job_id, 'updated_count': sum(chunk_counts)}
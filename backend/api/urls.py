@@ -28,6 +28,7 @@ urlpatterns = [
     path('applications/jobs/<str:job_id>/', applications.get_job_applications_by_id, name='get_job_applications_by_id'),
     path('applications/<str:application_id>/status/', applications.update_application_status, name='update_application_status'),
     path('jobs/<str:job_id>/rank/', applications.bulk_rank_candidates, name='bulk_rank_candidates'),
+    path('rerank/status/<str:task_id>/', applications.get_rerank_status, name='get_rerank_status'),
     
     # Interview endpoints
     path('interviews/', interviews.schedule_interview, name='schedule_interview'),
@@ -1,3 +1,4 @@
+from django.core.files.base import ContentFile
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
@@ -5,19 +6,18 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import json
 
-from es.repositories import UserRepository
-from storage.files import FileStorage
-from ml.resume_parser import ResumeParser
-from ml.embeddings import EmbeddingGenerator
-from common.utils import generate_uuid
+from es.repositories import user_repo
+from storage.files import file_storage
+from ml.resume_parser import resume_parser
+from ml.embeddings import get_embedding_generator
+from common.utils import generate_uuid, get_current_timestamp
+from .decorators import current_user
 
-user_repo = UserRepository()
-file_storage = FileStorage()
-resume_parser = ResumeParser()
-embedding_generator = EmbeddingGenerator()
+# Runs resume storage writes off the request thread, alongside parsing and embedding
+_upload_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='resume-upload')
 
 @api_view(['PUT'])
 def update_profile(request):
@@ -27,7 +27,7 @@ def update_profile(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -42,7 +42,7 @@ def update_profile(request):
                 update_data[field] = data[field]
         
         if update_data:
-            update_data['updated_at'] = datetime.utcnow().isoformat()
+            update_data['updated_at'] = get_current_timestamp()
             updated_user = user_repo.update(user_id, update_data)
             
             # Remove password hash from response
@@ -62,7 +62,7 @@ def upload_resume(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -80,31 +80,38 @@ def upload_resume(request):
         # Generate unique filename
         filename = f"resumes/{user_id}_{generate_uuid()}.{file_extension}"
         
-        # Save file
-        file_path = file_storage.save_file(resume_file, filename)
+        # Read the upload once and reuse the bytes for storage and parsing
+        content = resume_file.read()
         
         # Parse resume
-        resume_text = resume_parser.extract_text(resume_file)
+        resume_text = resume_parser.extract_text_from_bytes(content, resume_file.name)
         if not resume_text:
             return Response({'error': 'Failed to extract text from resume'}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Save file in the background while the resume is parsed and embedded
+        save_future = _upload_executor.submit(
+            file_storage.save_file, ContentFile(content, name=resume_file.name), filename
+        )
+        
         # Extract skills and other information
         parsed_data = resume_parser.parse_resume(resume_text)
         
         # Generate embeddings
-        resume_embedding = embedding_generator.generate_embedding(resume_text)
+        resume_embedding = get_embedding_generator().generate_embedding(resume_text)
+        
+        file_path = save_future.result()
         
         # Update user with resume data
         update_data = {
             'resume_file_path': file_path,
             'resume_text': resume_text,
             'resume_vec': resume_embedding,
-            'updated_at': datetime.utcnow().isoformat()
+            'updated_at': get_current_timestamp()
         }
         
         # Update skills if found in resume
         if parsed_data.get('skills'):
-            update_data['skills'] = list(set(user.get('skills', []) + parsed_data['skills']))
+            update_data['skills'] = list(set(user.get('skills', [])).union(parsed_data['skills']))
         
         # Update experience if found in resume
         if parsed_data.get('experience_years') and not user.get('experience_years'):
@@ -131,7 +138,7 @@ def search_candidates(request):
         if not user_id:
             return Response({'error': 'User not authenticated'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        user = user_repo.get_by_id(user_id)
+        user = current_user(request)
         if not user or user['role'] != 'recruiter':
             return Response({'error': 'Only recruiters can search candidates'}, status=status.HTTP_403_FORBIDDEN)
         
@@ -148,12 +155,6 @@ def search_candidates(request):
             min_experience=int(min_experience) if min_experience else None
         )
         
-        # Remove sensitive information
-        for candidate in candidates:
-            candidate.pop('password_hash', None)
-            candidate.pop('resume_text', None)
-            candidate.pop('resume_vec', None)
-        
         return Response(candidates, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -0,0 +1,95 @@
+import math
+import pickle
+import threading
+import time
+
+from cachetools import TLRUCache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Immutable values are stored as-is; anything else is pickled so callers can't mutate the cached copy
+_PLAIN_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def _entry_expiry(key, entry, now):
+    """Expiry time for a cache entry; entries without a timeout never expire"""
+    return entry[2]
+
+
+class TTLMemoryCache(BaseCache):
+    """Process-local cache backend on cachetools, skipping pickle for plain values"""
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        self._cache = TLRUCache(maxsize=self._max_entries, ttu=_entry_expiry, timer=time.time)
+        self._lock = threading.Lock()
+
+    def _expiry(self, timeout):
+        expiry = self.get_backend_timeout(timeout)
+        return math.inf if expiry is None else expiry
+
+    @staticmethod
+    def _pack(value, expiry):
+        if type(value) in _PLAIN_TYPES:
+            return (False, value, expiry)
+        return (True, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expiry)
+
+    @staticmethod
+    def _unpack(entry):
+        pickled, payload, _ = entry
+        return pickle.loads(payload) if pickled else payload
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if key in self._cache:
+                return False
+            self._cache[key] = self._pack(value, self._expiry(timeout))
+            return True
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        # cachetools caches reorder and expire entries on read, so reads lock too
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is None:
+            return default
+        return self._unpack(entry)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._pack(value, self._expiry(timeout))
+        with self._lock:
+            self._cache[key] = entry
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return False
+            self._cache[key] = (entry[0], entry[1], self._expiry(timeout))
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                raise ValueError("Key '%s' not found" % key)
+            new_value = self._unpack(entry) + delta
+            self._cache[key] = self._pack(new_value, entry[2])
+        return new_value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            return key in self._cache
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            return self._cache.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
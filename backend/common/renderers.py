@@ -0,0 +1,27 @@
+import orjson
+from typing import Any, Iterable, Iterator
+from rest_framework.renderers import BaseRenderer
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Render API responses with orjson, which emits UTF-8 bytes directly"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def stream_json_array(items: Iterable[Any]) -> Iterator[bytes]:
+    """Encode items as a JSON array one element at a time, for use with StreamingHttpResponse"""
+    yield b'['
+    first = True
+    for item in items:
+        if not first:
+            yield b','
+        yield orjson.dumps(item, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        first = False
+    yield b']'
@@ -1,57 +1,107 @@
 import hashlib
+import os
+import re
 import secrets
+import unicodedata
+import threading
 import bcrypt
+from cachetools import TTLCache
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from typing import Optional
 
+# Patterns compiled once at import
+_UNSAFE_FILENAME_CHARS_RE = re.compile(r'[^\w\s.-]')
+_WHITESPACE_RE = re.compile(r'\s+')
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Argon2id cost parameters; tune per host so verify_password takes roughly 50 ms
+_password_hasher = PasswordHasher(
+    time_cost=int(os.environ.get('ARGON2_TIME_COST', '2')),
+    memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', str(64 * 1024))),
+    parallelism=int(os.environ.get('ARGON2_PARALLELISM', '2'))
+)
+
 def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Hash a password using argon2id"""
+    return _password_hasher.hash(password)
+
+# Successful verifications of a (password, hash) pair, so repeated logins with the same
+# credentials skip the deliberately slow hash. Keys are MACed with a per-process secret
+# so the cache holds nothing usable for offline guessing; failures are never cached.
+_VERIFIED_CACHE = TTLCache(maxsize=4096, ttl=60)
+_VERIFIED_CACHE_LOCK = threading.Lock()
+_VERIFIED_CACHE_KEY = secrets.token_bytes(32)
 
 def verify_password(password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
+    """Verify a password against its hash (argon2id, or legacy bcrypt)"""
+    cache_key = hashlib.blake2b(
+        password.encode('utf-8') + b'|' + hashed_password.encode('utf-8'),
+        key=_VERIFIED_CACHE_KEY,
+        digest_size=16
+    ).digest()
+    with _VERIFIED_CACHE_LOCK:
+        if cache_key in _VERIFIED_CACHE:
+            return True
+    
+    if _verify_password_uncached(password, hashed_password):
+        with _VERIFIED_CACHE_LOCK:
+            _VERIFIED_CACHE[cache_key] = True
+        return True
+    return False
+
+def _verify_password_uncached(password: str, hashed_password: str) -> bool:
     try:
+        if hashed_password.startswith('$argon2'):
+            return _password_hasher.verify(hashed_password, password)
         return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+    except (VerificationError, InvalidHashError):
+        return False
     except Exception:
         return False
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash is legacy bcrypt or uses outdated argon2 parameters"""
+    if not hashed_password.startswith('$argon2'):
+        return True
+    return _password_hasher.check_needs_rehash(hashed_password)
+
 def generate_secure_token(length: int = 32) -> str:
     """Generate a secure random token"""
     return secrets.token_urlsafe(length)
 
+def _keyed_digest(data: str, salt: str) -> str:
+    """BLAKE2b of data keyed by salt (salts longer than a BLAKE2b key are hashed down first)"""
+    key = salt.encode('utf-8')
+    if len(key) > hashlib.blake2b.MAX_KEY_SIZE:
+        key = hashlib.blake2b(key).digest()
+    return hashlib.blake2b(data.encode('utf-8'), key=key, digest_size=32).hexdigest()
+
 def hash_data(data: str, salt: Optional[str] = None) -> str:
     """Hash arbitrary data with optional salt"""
     if salt is None:
         salt = secrets.token_hex(16)
     
-    combined = f"{data}{salt}"
-    hashed = hashlib.sha256(combined.encode('utf-8')).hexdigest()
-    return f"{salt}${hashed}"
+    return f"{salt}${_keyed_digest(data, salt)}"
 
 def verify_data_hash(data: str, hashed_data: str) -> bool:
     """Verify data against its hash"""
     try:
         salt, expected_hash = hashed_data.split('$', 1)
-        combined = f"{data}{salt}"
-        actual_hash = hashlib.sha256(combined.encode('utf-8')).hexdigest()
-        return secrets.compare_digest(expected_hash, actual_hash)
+        return secrets.compare_digest(expected_hash, _keyed_digest(data, salt))
     except Exception:
         return False
 
 def sanitize_filename(filename: str) -> str:
     """Sanitize filename for safe storage"""
-    import re
-    import unicodedata
-    
     # Normalize unicode
     filename = unicodedata.normalize('NFKD', filename)
     
     # Remove special characters
-    filename = re.sub(r'[^\w\s.-]', '', filename)
+    filename = _UNSAFE_FILENAME_CHARS_RE.sub('', filename)
     
     # Replace spaces with underscores
-    filename = re.sub(r'\s+', '_', filename)
+    filename = _WHITESPACE_RE.sub('_', filename)
     
     # Limit length
     if len(filename) > 100:
@@ -62,22 +112,34 @@ def sanitize_filename(filename: str) -> str:
 
 def validate_email(email: str) -> bool:
     """Validate email format"""
-    import re
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return _EMAIL_RE.match(email) is not None
 
 def validate_password_strength(password: str) -> tuple[bool, str]:
     """Validate password strength"""
     if len(password) < 8:
         return False, "Password must be at least 8 characters long"
     
-    if not any(c.isupper() for c in password):
+    # Check every character class in one pass, stopping once all are seen
+    has_upper = has_lower = has_digit = False
+    for c in password:
+        if c.isupper():
+            has_upper = True
+        elif c.islower():
+            has_lower = True
+        elif c.isdigit():
+            has_digit = True
+        else:
+            continue
+        if has_upper and has_lower and has_digit:
+            break
+    
+    if not has_upper:
         return False, "Password must contain at least one uppercase letter"
     
-    if not any(c.islower() for c in password):
+    if not has_lower:
         return False, "Password must contain at least one lowercase letter"
     
-    if not any(c.isdigit() for c in password):
+    if not has_digit:
         return False, "Password must contain at least one digit"
     
     return True, "Password is strong"
@@ -1,15 +1,36 @@
+import hashlib
 import uuid
 import re
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Union
 
+# Patterns compiled once at import
+_NON_SLUG_RE = re.compile(r'[^\w\s-]')
+_SLUG_SEPARATOR_RE = re.compile(r'[-\s]+')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_HTML_TAG_RE = re.compile('<.*?>')
+
+_SIZE_NAMES = ("B", "KB", "MB", "GB", "TB")
+
+# Common stop words dropped by extract_keywords
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
+    'have', 'has', 'had', 'will', 'would', 'could', 'should', 'may', 'might',
+    'can', 'must', 'shall', 'this', 'that', 'these', 'those'
+})
+
 def generate_uuid() -> str:
-    """Generate a UUID4 string"""
+    """Generate a UUID4 as 32 hex digits (no hyphens), used for document IDs and file names"""
+    return uuid.uuid4().hex
+
+def generate_uuid_canonical() -> str:
+    """Generate a UUID4 string in the canonical hyphenated form"""
     return str(uuid.uuid4())
 
 def get_current_timestamp() -> str:
-    """Get current timestamp in ISO format"""
-    return datetime.now(timezone.utc).isoformat()
+    """Get current UTC timestamp in ISO format, to the second"""
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
 
 def parse_timestamp(timestamp_str: str) -> Optional[datetime]:
     """Parse ISO timestamp string to datetime object"""
@@ -18,11 +39,15 @@ def parse_timestamp(timestamp_str: str) -> Optional[datetime]:
     except (ValueError, AttributeError):
         return None
 
+def content_hash(text: str) -> str:
+    """Short, stable fingerprint of a text, used to detect unchanged content"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
 def slugify(text: str) -> str:
     """Convert text to URL-friendly slug"""
     text = text.lower()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[-\s]+', '-', text)
+    text = _NON_SLUG_RE.sub('', text)
+    text = _SLUG_SEPARATOR_RE.sub('-', text)
     return text.strip('-')
 
 def truncate_text(text: str, max_length: int = 100, suffix: str = '...') -> str:
@@ -34,30 +59,13 @@ def truncate_text(text: str, max_length: int = 100, suffix: str = '...') -> str:
 def extract_keywords(text: str, min_length: int = 3) -> List[str]:
     """Extract keywords from text"""
     # Remove punctuation and convert to lowercase
-    cleaned = re.sub(r'[^\w\s]', ' ', text.lower())
-    
-    # Split into words and filter
-    words = [word for word in cleaned.split() if len(word) >= min_length]
+    words = _PUNCTUATION_RE.sub(' ', text.lower()).split()
     
-    # Remove common stop words
-    stop_words = {
-        'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-        'of', 'with', 'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being',
-        'have', 'has', 'had', 'will', 'would', 'could', 'should', 'may', 'might',
-        'can', 'must', 'shall', 'this', 'that', 'these', 'those'
-    }
-    
-    keywords = [word for word in words if word not in stop_words]
-    
-    # Remove duplicates while preserving order
-    unique_keywords = []
-    seen = set()
-    for keyword in keywords:
-        if keyword not in seen:
-            unique_keywords.append(keyword)
-            seen.add(keyword)
-    
-    return unique_keywords
+    # Filter short and stop words, removing duplicates while preserving order
+    return list(dict.fromkeys(
+        word for word in words
+        if len(word) >= min_length and word not in _STOP_WORDS
+    ))
 
 def calculate_percentage(part: Union[int, float], total: Union[int, float]) -> float:
     """Calculate percentage safely"""
@@ -73,24 +81,36 @@ def deep_merge_dicts(dict1: Dict[str, Any], dict2: Dict[str, Any]) -> Dict[str,
     """Deep merge two dictionaries"""
     result = dict1.copy()
     
-    for key, value in dict2.items():
-        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-            result[key] = deep_merge_dicts(result[key], value)
-        else:
-            result[key] = value
+    # Nested dicts are copied only where both sides have one to merge
+    pending = [(result, dict2)]
+    while pending:
+        target, source = pending.pop()
+        for key, value in source.items():
+            current = target.get(key)
+            if isinstance(current, dict) and isinstance(value, dict):
+                merged = target[key] = current.copy()
+                pending.append((merged, value))
+            else:
+                target[key] = value
     
     return result
 
 def flatten_dict(d: Dict[str, Any], parent_key: str = '', sep: str = '.') -> Dict[str, Any]:
     """Flatten nested dictionary"""
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
+    flat = {}
+    # Stack of (key prefix, item iterator), walked depth-first to keep key order
+    stack = [(parent_key, iter(d.items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for k, v in items:
+            new_key = f"{prefix}{sep}{k}" if prefix else k
+            if isinstance(v, dict):
+                stack.append((new_key, iter(v.items())))
+                break
+            flat[new_key] = v
         else:
-            items.append((new_key, v))
-    return dict(items)
+            stack.pop()
+    return flat
 
 def validate_uuid(uuid_string: str) -> bool:
     """Validate UUID string format"""
@@ -102,24 +122,16 @@ def validate_uuid(uuid_string: str) -> bool:
 
 def clean_html(text: str) -> str:
     """Remove HTML tags from text"""
-    import re
-    clean = re.compile('<.*?>')
-    return re.sub(clean, '', text)
+    return _HTML_TAG_RE.sub('', text)
 
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human readable format"""
     if size_bytes == 0:
         return "0 B"
     
-    size_names = ["B", "KB", "MB", "GB", "TB"]
-    i = 0
-    size = float(size_bytes)
-    
-    while size >= 1024.0 and i < len(size_names) - 1:
-        size /= 1024.0
-        i += 1
-    
-    return f"{size:.1f} {size_names[i]}"
+    # Each unit is 2**10 times the previous one, so the unit index comes straight from the bit length
+    i = min((int(size_bytes).bit_length() - 1) // 10, len(_SIZE_NAMES) - 1) if size_bytes >= 1024 else 0
+    return f"{size_bytes / (1 << (10 * i)):.1f} {_SIZE_NAMES[i]}"
 
 def extract_domain_from_email(email: str) -> Optional[str]:
     """Extract domain from email address"""
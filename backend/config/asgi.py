@@ -10,6 +10,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django_asgi_app = get_asgi_application()
 
 from api.routing import websocket_urlpatterns
+from config.runtime import bootstrap
+
+bootstrap()
 
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
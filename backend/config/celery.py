@@ -0,0 +1,16 @@
+import os
+
+from celery import Celery
+from celery.signals import worker_init
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+app = Celery('config')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
+
+@worker_init.connect
+def _bootstrap_worker(**kwargs):
+    """Run the same process setup as the web servers"""
+    from config.runtime import bootstrap
+    bootstrap()
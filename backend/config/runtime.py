@@ -0,0 +1,15 @@
+from django.conf import settings
+
+from config.sentry import init_sentry
+
+def bootstrap():
+    """Process setup for servers and workers that management commands skip"""
+    settings.LOGS_DIR.mkdir(exist_ok=True)
+    init_sentry()
+    
+    # Block until the indices exist so no request can write to an auto-created index
+    from es.indices import ensure_indices
+    if ensure_indices():
+        print("ES: All indices initialized successfully")
+    else:
+        print("ES: Warning - Indices not initialized, writes are refused until they are")
@@ -0,0 +1,16 @@
+from django.conf import settings
+
+def init_sentry():
+    """Initialize Sentry for the WSGI/ASGI server processes"""
+    if not settings.SENTRY_DSN or settings.DEBUG:
+        return
+    
+    import sentry_sdk
+    from sentry_sdk.integrations.django import DjangoIntegration
+    
+    sentry_sdk.init(
+        dsn=settings.SENTRY_DSN,
+        integrations=[DjangoIntegration()],
+        traces_sample_rate=0.1,
+        send_default_pii=True
+    )
@@ -1,24 +1,35 @@
 import os
 from pathlib import Path
+from types import MappingProxyType
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Environment snapshot read once (lowercase so Django doesn't expose it as a setting)
+_environ = dict(os.environ)
+
+def _env_bool(key, default):
+    """Read a 'true'/'false' environment variable"""
+    return _environ.get(key, default).lower() == 'true'
+
+def _env_int(key, default):
+    """Read an integer environment variable"""
+    return int(_environ.get(key, default))
+
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-dev-key-change-in-production')
+SECRET_KEY = _environ.get('SECRET_KEY', 'django-insecure-dev-key-change-in-production')
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
+DEBUG = _env_bool('DEBUG', 'True')
 
 ALLOWED_HOSTS = ['*']
 
 # Application definition
+# auth/contenttypes/sessions stay for DRF's request.user and Channels' AuthMiddlewareStack
 DJANGO_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
-    'django.contrib.messages',
     'django.contrib.staticfiles',
 ]
 
@@ -39,7 +50,10 @@ LOCAL_APPS = [
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    'api.middleware.RequestClassifyMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    # Throttles per client IP before any authentication or password hashing work is done
+    'api.middleware.RateLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,7 +61,6 @@ MIDDLEWARE = [
     'api.middleware.JWTAuthenticationMiddleware',
     'api.middleware.CORSMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -63,7 +76,6 @@ TEMPLATES = [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
             ],
         },
     },
@@ -75,22 +87,6 @@ ASGI_APPLICATION = 'config.asgi.application'
 # Since we're using Elasticsearch only, no traditional database
 DATABASES = {}
 
-# Password validation
-AUTH_PASSWORD_VALIDATORS = [
-    {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
-    },
-    {
-        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
-    },
-]
-
 # Internationalization
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -99,11 +95,11 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATIC_ROOT = str(BASE_DIR / 'staticfiles')
 
 # Media files
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = str(BASE_DIR / 'media')
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -117,7 +113,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'common.renderers.ORJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'common.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
@@ -132,26 +133,27 @@ CORS_ALLOWED_ORIGINS = [
 ] if not DEBUG else []
 
 # Elasticsearch settings
-ELASTICSEARCH_HOST = os.environ.get('ELASTICSEARCH_HOST', 'localhost')
-ELASTICSEARCH_PORT = int(os.environ.get('ELASTICSEARCH_PORT', '9200'))
-ELASTICSEARCH_USERNAME = os.environ.get('ELASTICSEARCH_USERNAME', '')
-ELASTICSEARCH_PASSWORD = os.environ.get('ELASTICSEARCH_PASSWORD', '')
+ELASTICSEARCH_HOST = _environ.get('ELASTICSEARCH_HOST', 'localhost')
+ELASTICSEARCH_PORT = _env_int('ELASTICSEARCH_PORT', '9200')
+ELASTICSEARCH_USERNAME = _environ.get('ELASTICSEARCH_USERNAME', '')
+ELASTICSEARCH_PASSWORD = _environ.get('ELASTICSEARCH_PASSWORD', '')
+ELASTICSEARCH_POOL_SIZE = _env_int('ELASTICSEARCH_POOL_SIZE', '25')
 
 # File storage settings
-FILE_STORAGE_BACKEND = os.environ.get('FILE_STORAGE_BACKEND', 'local')
-AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID', '')
-AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY', '')
-AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME', '')
-AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME', 'us-east-1')
+FILE_STORAGE_BACKEND = _environ.get('FILE_STORAGE_BACKEND', 'local')
+AWS_ACCESS_KEY_ID = _environ.get('AWS_ACCESS_KEY_ID', '')
+AWS_SECRET_ACCESS_KEY = _environ.get('AWS_SECRET_ACCESS_KEY', '')
+AWS_STORAGE_BUCKET_NAME = _environ.get('AWS_STORAGE_BUCKET_NAME', '')
+AWS_S3_REGION_NAME = _environ.get('AWS_S3_REGION_NAME', 'us-east-1')
 
 # JWT settings
-JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', SECRET_KEY)
+JWT_SECRET_KEY = _environ.get('JWT_SECRET_KEY', SECRET_KEY)
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_DELTA = 24 * 60 * 60  # 24 hours in seconds
 
 # ML Model settings
-SENTENCE_TRANSFORMER_MODEL = os.environ.get('SENTENCE_TRANSFORMER_MODEL', 'all-MiniLM-L6-v2')
-EMBEDDING_DIMENSION = int(os.environ.get('EMBEDDING_DIMENSION', '384'))
+SENTENCE_TRANSFORMER_MODEL = _environ.get('SENTENCE_TRANSFORMER_MODEL', 'all-MiniLM-L6-v2')
+EMBEDDING_DIMENSION = _env_int('EMBEDDING_DIMENSION', '384')
 
 # Channels settings
 CHANNEL_LAYERS = {
@@ -160,6 +162,14 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Celery settings (background jobs such as candidate re-ranking)
+CELERY_BROKER_URL = _environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = _environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_RESULT_EXPIRES = 3600
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
@@ -178,6 +188,8 @@ if not DEBUG:
     SECURE_HSTS_PRELOAD = True
 
 # Logging
+LOGS_DIR = BASE_DIR / 'logs'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -198,7 +210,9 @@ LOGGING = {
         },
         'file': {
             'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs', 'django.log'),
+            'filename': str(LOGS_DIR / 'django.log'),
+            # Open on first write, so processes that never log here don't need the directory
+            'delay': True,
             'formatter': 'verbose',
         },
     },
@@ -230,12 +244,19 @@ LOGGING = {
     },
 }
 
-# Create logs directory if it doesn't exist
-os.makedirs(os.path.join(BASE_DIR, 'logs'), exist_ok=True)
+# The logs directory is created by config.runtime.bootstrap() in server and worker processes
 
-# Cache settings (using in-memory cache for simplicity)
+# Cache settings: process-local TTL cache that only pickles non-primitive values
 CACHES = {
     'default': {
+        'BACKEND': 'common.fastcache.TTLMemoryCache',
+        'TIMEOUT': 300,  # 5 minutes
+        'OPTIONS': {
+            'MAX_ENTRIES': 10_000,
+        }
+    },
+    # Django's locmem backend, for callers that want its stock semantics
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'unique-snowflake',
         'TIMEOUT': 300,  # 5 minutes
@@ -263,33 +284,26 @@ THOUSAND_SEPARATOR = ','
 APP_NAME = 'AI Talent Match'
 APP_VERSION = '1.0.0'
 MAX_RESUME_SIZE = 5 * 1024 * 1024  # 5MB
-ALLOWED_RESUME_EXTENSIONS = ['.pdf', '.docx', '.doc']
+ALLOWED_RESUME_EXTENSIONS = ('.pdf', '.docx', '.doc')
 
 # ML Pipeline settings
 ML_BATCH_SIZE = 32
 ML_MAX_TEXT_LENGTH = 5000
-RANKING_WEIGHTS = {
+RANKING_WEIGHTS = MappingProxyType({
     'bm25': 0.4,
     'semantic': 0.5,
     'rule_boost': 0.1
-}
+})
 
-# Rate limiting (for future implementation)
+# Per-client API rate limiting, enforced by api.middleware.RateLimitMiddleware
 RATE_LIMIT_ENABLED = True
 RATE_LIMIT_REQUESTS = 100
 RATE_LIMIT_WINDOW = 3600  # 1 hour
+# Shared rate limit counters; each process counts on its own when unset
+RATE_LIMIT_REDIS_URL = _environ.get('RATE_LIMIT_REDIS_URL')
 
 # Monitoring and analytics
-ANALYTICS_ENABLED = os.environ.get('ANALYTICS_ENABLED', 'False').lower() == 'true'
-SENTRY_DSN = os.environ.get('SENTRY_DSN', '')
-
-if SENTRY_DSN and not DEBUG:
-    import sentry_sdk
-    from sentry_sdk.integrations.django import DjangoIntegration
-    
-    sentry_sdk.init(
-        dsn=SENTRY_DSN,
-        integrations=[DjangoIntegration()],
-        traces_sample_rate=0.1,
-        send_default_pii=True
-    )
+ANALYTICS_ENABLED = _env_bool('ANALYTICS_ENABLED', 'False')
+# Sentry is initialized by config.runtime.bootstrap() in server and worker processes, not here
+SENTRY_DSN = _environ.get('SENTRY_DSN', '')
+
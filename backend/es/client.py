@@ -1,86 +1,144 @@
 from elasticsearch import Elasticsearch
+from elasticsearch.helpers import parallel_bulk
 from elasticsearch.exceptions import ConnectionError, RequestError
 from django.conf import settings
 import logging
+import threading
+import time
+from typing import Iterable
 
 logger = logging.getLogger(__name__)
 
-class ElasticsearchClient:
-    _instance = None
-    _client = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(ElasticsearchClient, cls).__new__(cls)
-        return cls._instance
-    
-    def __init__(self):
-        if self._client is None:
-            self._client = self._create_client()
-    
-    def _create_client(self):
-        """Create Elasticsearch client"""
-        try:
-            # Build connection configuration
-            config = {
-                'hosts': [{'host': settings.ELASTICSEARCH_HOST, 'port': settings.ELASTICSEARCH_PORT}],
-                'timeout': 30,
-                'max_retries': 3,
-                'retry_on_timeout': True
+_client = None
+_client_lock = threading.Lock()
+
+# Seconds a connection check result is reused before pinging again
+PING_TTL = 5.0
+_last_ping = (float('-inf'), False)  # (monotonic time, connected)
+_ping_lock = threading.Lock()
+
+# Settings shared by every index; per-index extras are merged over them
+_BASE_INDEX_SETTINGS = {
+    "number_of_shards": 1,
+    "number_of_replicas": 0,
+    "analysis": {
+        "analyzer": {
+            "custom_text_analyzer": {
+                "type": "custom",
+                "tokenizer": "standard",
+                "filter": ["lowercase", "stop", "snowball"]
             }
-            
-            # Add authentication if provided
-            if settings.ELASTICSEARCH_USERNAME and settings.ELASTICSEARCH_PASSWORD:
-                config['http_auth'] = (settings.ELASTICSEARCH_USERNAME, settings.ELASTICSEARCH_PASSWORD)
-            
-            client = Elasticsearch(**config)
-            
-            # Test connection
-            if client.ping():
-                logger.info("Successfully connected to Elasticsearch")
-                return client
-            else:
-                logger.error("Failed to ping Elasticsearch")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Failed to create Elasticsearch client: {e}")
+        }
+    }
+}
+
+def _create_client():
+    """Create Elasticsearch client"""
+    try:
+        # Build connection configuration
+        config = {
+            'hosts': [{'host': settings.ELASTICSEARCH_HOST, 'port': settings.ELASTICSEARCH_PORT}],
+            'timeout': 30,
+            'max_retries': 3,
+            'retry_on_timeout': True,
+            # Gzip request bodies; vectors and resume text compress well
+            'http_compress': True,
+            # Keep enough pooled connections for every concurrent request thread
+            'connections_per_node': settings.ELASTICSEARCH_POOL_SIZE
+        }
+        
+        # Add authentication if provided
+        if settings.ELASTICSEARCH_USERNAME and settings.ELASTICSEARCH_PASSWORD:
+            config['http_auth'] = (settings.ELASTICSEARCH_USERNAME, settings.ELASTICSEARCH_PASSWORD)
+        
+        client = Elasticsearch(**config)
+        
+        # Test connection
+        if client.ping():
+            logger.info("Successfully connected to Elasticsearch")
+            return client
+        else:
+            logger.error("Failed to ping Elasticsearch")
             return None
-    
-    def get_client(self):
-        """Get Elasticsearch client instance"""
-        if self._client is None:
-            self._client = self._create_client()
-        return self._client
-    
-    def is_connected(self):
-        """Check if connected to Elasticsearch"""
+            
+    except Exception as e:
+        logger.error(f"Failed to create Elasticsearch client: {e}")
+        return None
+
+def get_elasticsearch_client():
+    """Get the global Elasticsearch client, creating it on first use"""
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        # A failed connection leaves _client unset so the next call retries
+        if _client is None:
+            _client = _create_client()
+        return _client
+
+def check_elasticsearch_connection():
+    """Check if Elasticsearch is available, reusing a ping result for PING_TTL seconds"""
+    global _last_ping
+    with _ping_lock:
+        checked_at, connected = _last_ping
+        now = time.monotonic()
+        if now - checked_at < PING_TTL:
+            return connected
+        
+        client = get_elasticsearch_client()
         try:
-            return self._client is not None and self._client.ping()
-        except:
-            return False
-    
-    def close(self):
-        """Close Elasticsearch connection"""
-        if self._client:
+            connected = client is not None and client.ping()
+        except Exception:
+            connected = False
+        _last_ping = (now, connected)
+        return connected
+
+def close_elasticsearch_client():
+    """Close the global Elasticsearch connection"""
+    global _client, _last_ping
+    with _client_lock:
+        if _client:
             try:
-                self._client.close()
-            except:
+                _client.close()
+            except Exception:
                 pass
-            self._client = None
+            _client = None
+            _last_ping = (float('-inf'), False)
 
-# Singleton instance
-es_client = ElasticsearchClient()
-
-def get_elasticsearch_client():
-    """Get the global Elasticsearch client"""
-    return es_client.get_client()
+def get_existing_indices(index_names) -> dict:
+    """Return the mapped properties of each of the given indices that exists, in a single request"""
+    client = get_elasticsearch_client()
+    if not client:
+        logger.error("Elasticsearch client not available")
+        return {}
+    
+    response = client.indices.get(index=','.join(index_names), ignore_unavailable=True)
+    return {name: index['mappings'].get('properties', {}) for name, index in response.items()}
 
-def check_elasticsearch_connection():
-    """Check if Elasticsearch is available"""
-    return es_client.is_connected()
+def create_index(index_name: str, mapping: dict, extra_settings: dict = None):
+    """Create index with mapping, without checking whether it exists"""
+    client = get_elasticsearch_client()
+    if not client:
+        logger.error("Elasticsearch client not available")
+        return False
+    
+    try:
+        index_settings = {**_BASE_INDEX_SETTINGS, **extra_settings} if extra_settings else _BASE_INDEX_SETTINGS
+        
+        client.indices.create(
+            index=index_name,
+            body={
+                "mappings": mapping,
+                "settings": index_settings
+            }
+        )
+        logger.info(f"Created index: {index_name}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to create index {index_name}: {e}")
+        return False
 
-def create_index_if_not_exists(index_name: str, mapping: dict):
+def create_index_if_not_exists(index_name: str, mapping: dict, extra_settings: dict = None):
     """Create index with mapping if it doesn't exist"""
     client = get_elasticsearch_client()
     if not client:
@@ -88,35 +146,14 @@ def create_index_if_not_exists(index_name: str, mapping: dict):
         return False
     
     try:
-        if not client.indices.exists(index=index_name):
-            response = client.indices.create(
-                index=index_name,
-                body={
-                    "mappings": mapping,
-                    "settings": {
-                        "number_of_shards": 1,
-                        "number_of_replicas": 0,
-                        "analysis": {
-                            "analyzer": {
-                                "custom_text_analyzer": {
-                                    "type": "custom",
-                                    "tokenizer": "standard",
-                                    "filter": ["lowercase", "stop", "snowball"]
-                                }
-                            }
-                        }
-                    }
-                }
-            )
-            logger.info(f"Created index: {index_name}")
-            return True
-        else:
+        if client.indices.exists(index=index_name):
             logger.info(f"Index already exists: {index_name}")
             return True
-            
     except Exception as e:
         logger.error(f"Failed to create index {index_name}: {e}")
         return False
+    
+    return create_index(index_name, mapping, extra_settings)
 
 def delete_index(index_name: str):
     """Delete an index"""
@@ -151,34 +188,49 @@ def refresh_index(index_name: str):
         logger.error(f"Failed to refresh index {index_name}: {e}")
         return False
 
-def bulk_index_documents(index_name: str, documents: list):
-    """Bulk index multiple documents"""
+# Worker threads used to send bulk chunks concurrently
+BULK_THREAD_COUNT = 4
+
+def _iter_index_actions(index_name: str, documents):
+    """Yield one bulk index action per document"""
+    for doc in documents:
+        yield {
+            "_index": index_name,
+            "_id": doc.get('id'),
+            "_source": doc
+        }
+
+def bulk_index_documents(index_name: str, documents: Iterable[dict]):
+    """Bulk index documents, streaming them to Elasticsearch in parallel chunks"""
     client = get_elasticsearch_client()
     if not client:
         logger.error("Elasticsearch client not available")
         return False
     
     try:
-        from elasticsearch.helpers import bulk
-        
-        actions = []
-        for doc in documents:
-            action = {
-                "_index": index_name,
-                "_id": doc.get('id'),
-                "_source": doc
-            }
-            actions.append(action)
+        success = failed = 0
+        # Chunks are sent from several threads so network round trips overlap
+        for ok, _ in parallel_bulk(
+            client,
+            _iter_index_actions(index_name, documents),
+            thread_count=BULK_THREAD_COUNT,
+            chunk_size=500,
+            max_chunk_bytes=10 * 1024 * 1024,
+            raise_on_error=False
+        ):
+            if ok:
+                success += 1
+            else:
+                failed += 1
         
-        if actions:
-            success, failed = bulk(client, actions)
-            logger.info(f"Bulk indexed {success} documents to {index_name}")
-            if failed:
-                logger.warning(f"Failed to index {len(failed)} documents")
-            return True
-        else:
+        if not success and not failed:
             logger.info("No documents to index")
             return True
+        
+        logger.info(f"Bulk indexed {success} documents to {index_name}")
+        if failed:
+            logger.warning(f"Failed to index {failed} documents")
+        return not failed
             
     except Exception as e:
         logger.error(f"Failed to bulk index documents to {index_name}: {e}")
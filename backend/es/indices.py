@@ -1,8 +1,16 @@
-from .client import create_index_if_not_exists
+from .client import create_index, get_elasticsearch_client, get_existing_indices
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Embeddings are indexed as scalar-quantized int8 HNSW graphs (4x smaller than float32).
+# int8_hnsw needs an Elasticsearch 8.12+ server; older clusters get plain HNSW graphs.
+VECTOR_INDEX_OPTIONS = {"type": "int8_hnsw"}
+FALLBACK_VECTOR_INDEX_OPTIONS = {"type": "hnsw"}
+INT8_HNSW_MIN_VERSION = (8, 12)
+
 # Index mappings following the specification
 USERS_MAPPING = {
     "properties": {
@@ -15,6 +23,8 @@ USERS_MAPPING = {
         "skills": {"type": "keyword"},
         "experience_years": {"type": "integer"},
         "location": {"type": "keyword"},
+        "location_lc": {"type": "keyword"},
+        "skills_set": {"type": "keyword"},
         "resume_file_path": {"type": "keyword"},
         "resume_text": {
             "type": "text",
@@ -24,7 +34,8 @@ USERS_MAPPING = {
             "type": "dense_vector",
             "dims": 384,
             "index": True,
-            "similarity": "cosine"
+            "similarity": "cosine",
+            "index_options": VECTOR_INDEX_OPTIONS
         },
         "created_at": {"type": "date"},
         "updated_at": {"type": "date"}
@@ -47,12 +58,16 @@ JOBS_MAPPING = {
         "skills_required": {"type": "keyword"},
         "min_exp": {"type": "integer"},
         "location": {"type": "keyword"},
+        "location_lc": {"type": "keyword"},
+        "skills_set": {"type": "keyword"},
         "employment_type": {"type": "keyword"},
+        "job_text_hash": {"type": "keyword", "index": False},
         "job_vec": {
             "type": "dense_vector",
             "dims": 384,
             "index": True,
-            "similarity": "cosine"
+            "similarity": "cosine",
+            "index_options": VECTOR_INDEX_OPTIONS
         },
         "created_at": {"type": "date"},
         "status": {"type": "keyword"}
@@ -103,52 +118,59 @@ EVENTS_MAPPING = {
     }
 }
 
+MESSAGES_MAPPING = {
+    "properties": {
+        "id": {"type": "keyword"},
+        "application_id": {"type": "keyword"},
+        "sender_id": {"type": "keyword"},
+        "sender_name": {"type": "text"},
+        "sender_role": {"type": "keyword"},
+        "content": {"type": "text"},
+        "timestamp": {"type": "date"}
+    }
+}
+
+# Chat messages are written in buffered bulk batches, so trade a few seconds of
+# search visibility and fsync-per-request durability for write throughput
+MESSAGES_SETTINGS = {
+    "refresh_interval": "5s",
+    "translog": {"durability": "async"}
+}
+
+# Append-only event log: nothing reads it back immediately, so refresh rarely
+EVENTS_SETTINGS = {
+    "refresh_interval": "30s"
+}
+
 # Index names
 USERS_INDEX = "users"
 JOBS_INDEX = "jobs"
 APPLICATIONS_INDEX = "applications"
 INTERVIEWS_INDEX = "interviews"
 EVENTS_INDEX = "events"
+MESSAGES_INDEX = "messages"
 
-def create_all_indices():
-    """Create all required indices with their mappings"""
-    indices = [
-        (USERS_INDEX, USERS_MAPPING),
-        (JOBS_INDEX, JOBS_MAPPING),
-        (APPLICATIONS_INDEX, APPLICATIONS_MAPPING),
-        (INTERVIEWS_INDEX, INTERVIEWS_MAPPING),
-        (EVENTS_INDEX, EVENTS_MAPPING)
-    ]
-    
-    success_count = 0
-    for index_name, mapping in indices:
-        if create_index_if_not_exists(index_name, mapping):
-            success_count += 1
-        else:
-            logger.error(f"Failed to create index: {index_name}")
-    
-    if success_count == len(indices):
-        logger.info("All indices created successfully")
-        return True
-    else:
-        logger.error(f"Only {success_count}/{len(indices)} indices created successfully")
-        return False
+_INDEX_MAPPINGS = {
+    USERS_INDEX: USERS_MAPPING,
+    JOBS_INDEX: JOBS_MAPPING,
+    APPLICATIONS_INDEX: APPLICATIONS_MAPPING,
+    INTERVIEWS_INDEX: INTERVIEWS_MAPPING,
+    EVENTS_INDEX: EVENTS_MAPPING,
+    MESSAGES_INDEX: MESSAGES_MAPPING
+}
+
+# Per-index settings merged over the shared defaults at creation time
+_INDEX_SETTINGS = {
+    EVENTS_INDEX: EVENTS_SETTINGS,
+    MESSAGES_INDEX: MESSAGES_SETTINGS
+}
 
 def get_index_mapping(index_name: str):
     """Get mapping for a specific index"""
-    mappings = {
-        USERS_INDEX: USERS_MAPPING,
-        JOBS_INDEX: JOBS_MAPPING,
-        APPLICATIONS_INDEX: APPLICATIONS_MAPPING,
-        INTERVIEWS_INDEX: INTERVIEWS_MAPPING,
-        EVENTS_INDEX: EVENTS_MAPPING
-    }
-    return mappings.get(index_name)
+    return _INDEX_MAPPINGS.get(index_name)
 
 def update_index_mapping(index_name: str, new_fields: dict):
     """Update index mapping with new fields"""
-    from .client import get_elasticsearch_client
-    
     client = get_elasticsearch_client()
     if not client:
         logger.error("Elasticsearch client not available")
@@ -167,8 +189,6 @@ def update_index_mapping(index_name: str, new_fields: dict):
 
 def get_index_stats(index_name: str = None):
     """Get statistics for indices"""
-    from .client import get_elasticsearch_client
-    
     client = get_elasticsearch_client()
     if not client:
         logger.error("Elasticsearch client not available")
@@ -179,16 +199,13 @@ def get_index_stats(index_name: str = None):
             return client.indices.stats(index=index_name)
         else:
             # Get stats for all our indices
-            indices = [USERS_INDEX, JOBS_INDEX, APPLICATIONS_INDEX, INTERVIEWS_INDEX, EVENTS_INDEX]
-            return client.indices.stats(index=','.join(indices))
+            return client.indices.stats(index=','.join(_INDEX_MAPPINGS))
     except Exception as e:
         logger.error(f"Failed to get index stats: {e}")
         return None
 
 def reindex_data(source_index: str, dest_index: str):
     """Reindex data from source to destination index"""
-    from .client import get_elasticsearch_client
-    
     client = get_elasticsearch_client()
     if not client:
         logger.error("Elasticsearch client not available")
@@ -207,11 +224,97 @@ def reindex_data(source_index: str, dest_index: str):
         logger.error(f"Failed to reindex from {source_index} to {dest_index}: {e}")
         return False
 
-# Initialize indices on module import
+def _vector_index_options(client) -> dict:
+    """Vector index options the connected cluster supports"""
+    version = client.info()['version']['number']
+    major, minor = (int(part) for part in version.split('.')[:2])
+    if (major, minor) >= INT8_HNSW_MIN_VERSION:
+        return VECTOR_INDEX_OPTIONS
+    logger.warning(f"Elasticsearch {version} predates int8_hnsw, indexing vectors as plain hnsw")
+    return FALLBACK_VECTOR_INDEX_OPTIONS
+
+def _with_vector_index_options(mapping: dict, index_options: dict) -> dict:
+    """Copy of a mapping with every dense_vector field using index_options"""
+    properties = {
+        name: {**field, "index_options": index_options} if field.get("type") == "dense_vector" else field
+        for name, field in mapping["properties"].items()
+    }
+    return {**mapping, "properties": properties}
+
+def _check_existing_mapping(index_name: str, mapping: dict, existing_properties: dict) -> bool:
+    """Whether an existing index has the expected field types, adding any fields it lacks
+    
+    An index Elasticsearch auto-created on a write has dynamic mappings (text for keywords,
+    float for vectors), which no mapping update can fix; it has to be recreated.
+    """
+    conflicts = [
+        name for name, field in mapping["properties"].items()
+        if name in existing_properties and existing_properties[name].get("type", "object") != field["type"]
+    ]
+    if conflicts:
+        logger.error(
+            f"Index {index_name} has unexpected types for {', '.join(sorted(conflicts))}; "
+            f"it was probably auto-created and must be recreated and reindexed"
+        )
+        return False
+    
+    missing = {name: field for name, field in mapping["properties"].items() if name not in existing_properties}
+    if missing:
+        return update_index_mapping(index_name, missing)
+    return True
+
+# Until the indices exist, writes are refused so Elasticsearch can't auto-create them
+# with dynamic mappings; a failed check is retried at most every INDICES_RETRY_INTERVAL seconds
+INDICES_RETRY_INTERVAL = 5.0
+_indices_ready = False
+_indices_checked_at = None
+_indices_lock = threading.Lock()
+
+def ensure_indices() -> bool:
+    """Initialize the indices once per process, returning whether they are ready"""
+    global _indices_ready, _indices_checked_at
+    if _indices_ready:
+        return True
+    
+    with _indices_lock:
+        if _indices_ready:
+            return True
+        now = time.monotonic()
+        if _indices_checked_at is not None and now - _indices_checked_at < INDICES_RETRY_INTERVAL:
+            return False
+        _indices_checked_at = now
+        _indices_ready = initialize_indices()
+        return _indices_ready
+
 def initialize_indices():
-    """Initialize all indices - called during Django startup"""
+    """Create any missing indices with their mappings and check the existing ones"""
     try:
-        return create_all_indices()
+        # One request fetches every existing index's mapping, then only the missing ones are created
+        existing = get_existing_indices(_INDEX_MAPPINGS)
+        
+        # The cluster version only matters when something has to be created
+        index_options = VECTOR_INDEX_OPTIONS
+        if len(existing) < len(_INDEX_MAPPINGS):
+            index_options = _vector_index_options(get_elasticsearch_client())
+        
+        success_count = 0
+        for index_name, mapping in _INDEX_MAPPINGS.items():
+            if index_name in existing:
+                if _check_existing_mapping(index_name, mapping, existing[index_name]):
+                    logger.info(f"Index already exists: {index_name}")
+                    success_count += 1
+            elif create_index(index_name, _with_vector_index_options(mapping, index_options),
+                              _INDEX_SETTINGS.get(index_name)):
+                success_count += 1
+            else:
+                logger.error(f"Failed to create index: {index_name}")
     except Exception as e:
         logger.error(f"Failed to initialize indices: {e}")
         return False
+    
+    if success_count != len(_INDEX_MAPPINGS):
+        logger.error(f"Only {success_count}/{len(_INDEX_MAPPINGS)} indices created successfully")
+        return False
+    
+    logger.info("All indices created successfully")
+    return True
@@ -1,33 +1,144 @@
+import hashlib
+import logging
+import queue
+import threading
+import time
 import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+import numpy as np
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from elasticsearch.exceptions import NotFoundError
+from elasticsearch.helpers import bulk, parallel_bulk
+from cachetools import TTLCache
 from .client import get_elasticsearch_client
-from .indices import USERS_INDEX, JOBS_INDEX, APPLICATIONS_INDEX, INTERVIEWS_INDEX, EVENTS_INDEX
+from .indices import USERS_INDEX, JOBS_INDEX, APPLICATIONS_INDEX, INTERVIEWS_INDEX, EVENTS_INDEX, MESSAGES_INDEX, ensure_indices
+
+logger = logging.getLogger(__name__)
+
+# Write-time derived fields that only ranking reads; the API never returns them
+INTERNAL_FIELDS = ['location_lc', 'skills_set']
+
+def without_internal_fields(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a document without its write-time derived fields, for API responses"""
+    return {key: value for key, value in document.items() if key not in INTERNAL_FIELDS}
+
+def _add_normalized_fields(document: Dict[str, Any], skills_field: str) -> Dict[str, Any]:
+    """Store lowercased location and skills alongside the originals so ranking can compare them directly"""
+    if 'location' in document:
+        document['location_lc'] = (document['location'] or '').lower()
+    if skills_field in document:
+        document['skills_set'] = sorted({skill.lower() for skill in document[skills_field] or []})
+    return document
+
+# Decimal places kept for stored unit-vector components; the index itself holds int8
+VECTOR_DECIMALS = 6
+
+def _normalize_vector(document: Dict[str, Any], vector_field: str) -> Dict[str, Any]:
+    """Store an embedding L2-normalized and compactly rounded so similarity is a plain dot product"""
+    vector = document.get(vector_field)
+    if vector is not None and len(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            # Round in float64 so the JSON holds short decimals rather than expanded float32 values
+            unit = (vector / norm).astype(np.float64)
+            document[vector_field] = unit.round(VECTOR_DECIMALS).tolist()
+    return document
+
+def _refresh_param(refresh: bool) -> Optional[str]:
+    """Map a read-your-writes flag to the Elasticsearch refresh parameter"""
+    return 'wait_for' if refresh else None
 
 class BaseRepository:
+    # Source field holding the skills list that is normalized into 'skills_set'
+    skills_field: Optional[str] = None
+    # Embedding field that is stored as a unit vector
+    vector_field: Optional[str] = None
+    
     def __init__(self, index_name: str):
         self.index_name = index_name
         self.client = get_elasticsearch_client()
     
-    def create(self, document: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a new document"""
+    def create(self, document: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
+        """Create a new document
+        
+        Writes become searchable on the index's next scheduled refresh; pass refresh=True
+        when a following search must already see this document. Raises ConflictError if a
+        document with the same ID already exists, rather than overwriting it.
+        """
         if not self.client:
             raise Exception("Elasticsearch client not available")
+        self._require_indices()
+        
+        self._prepare_document(document)
         
         doc_id = document.get('id')
         if not doc_id:
-            doc_id = str(uuid.uuid4())
+            doc_id = uuid.uuid4().hex
             document['id'] = doc_id
         
-        response = self.client.index(
+        self.client.index(
             index=self.index_name,
             id=doc_id,
             body=document,
-            refresh='wait_for'
+            op_type='create',
+            refresh=_refresh_param(refresh)
         )
         
-        return document
+        return without_internal_fields(document)
+    
+    def bulk_create(self, documents: Iterable[Dict[str, Any]], thread_count: int = 4,
+                    chunk_size: int = 500, max_chunk_bytes: int = 10 * 1024 * 1024) -> List[Dict[str, Any]]:
+        """Create many documents with parallel bulk requests, returning the items Elasticsearch rejected
+        
+        Meant for seeding and imports: documents become searchable on the next index
+        refresh rather than immediately. Each failure is the bulk response item, carrying
+        the document's _id, status and error.
+        """
+        if not self.client:
+            raise Exception("Elasticsearch client not available")
+        self._require_indices()
+        
+        def actions():
+            for document in documents:
+                self._prepare_document(document)
+                if not document.get('id'):
+                    document['id'] = uuid.uuid4().hex
+                yield {'_index': self.index_name, '_id': document['id'], '_source': document}
+        
+        success = 0
+        failures = []
+        for ok, item in parallel_bulk(
+            self.client,
+            actions(),
+            thread_count=thread_count,
+            chunk_size=chunk_size,
+            max_chunk_bytes=max_chunk_bytes,
+            raise_on_error=False
+        ):
+            if ok:
+                success += 1
+            else:
+                failures.append(next(iter(item.values())))
+        
+        logger.info(f"Bulk indexed {success} documents to {self.index_name}")
+        if failures:
+            logger.warning(f"Failed to index {len(failures)} documents to {self.index_name}: "
+                           f"{[failure.get('_id') for failure in failures[:10]]}")
+        return failures
+    
+    def _require_indices(self) -> None:
+        """Refuse to write before the indices exist, since Elasticsearch would auto-create them"""
+        if not ensure_indices():
+            raise Exception("Elasticsearch indices are not initialized")
+    
+    def _prepare_document(self, document: Dict[str, Any]) -> None:
+        """Add write-time derived fields before a document or partial update is stored"""
+        if self.skills_field:
+            _add_normalized_fields(document, self.skills_field)
+        if self.vector_field:
+            _normalize_vector(document, self.vector_field)
     
     def get_by_id(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """Get document by ID"""
@@ -42,24 +153,86 @@ class BaseRepository:
             return response['_source']
         except NotFoundError:
             return None
+
+    def get_with_version(self, doc_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[int]]:
+        """Get document by ID with the seq_no and primary_term needed for a conditional update"""
+        if not self.client:
+            return None, None, None
+        
+        try:
+            response = self.client.get(
+                index=self.index_name,
+                id=doc_id
+            )
+            return response['_source'], response['_seq_no'], response['_primary_term']
+        except NotFoundError:
+            return None, None, None
+
+    def get_many(self, doc_ids, source_excludes: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Get multiple documents by ID in a single mget round trip"""
+        if not self.client:
+            return {}
+        
+        doc_ids = list(dict.fromkeys(doc_ids))
+        if not doc_ids:
+            return {}
+        
+        response = self.client.mget(
+            index=self.index_name,
+            body={'ids': doc_ids},
+            source_excludes=source_excludes
+        )
+        return {doc['_id']: doc['_source'] for doc in response['docs'] if doc.get('found')}
     
-    def update(self, doc_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Update document"""
+    def update(self, doc_id: str, updates: Dict[str, Any], seq_no: Optional[int] = None,
+               primary_term: Optional[int] = None, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Update document
+        
+        When seq_no and primary_term (from get_with_version) are given, the update only
+        applies if the document is unchanged since it was read; otherwise ConflictError
+        is raised.
+        """
         if not self.client:
             return None
+        self._require_indices()
+        
+        self._prepare_document(updates)
         
         try:
-            self.client.update(
+            # Ask for the updated source inline rather than reading it back with a second request
+            response = self.client.update(
                 index=self.index_name,
                 id=doc_id,
-                body={'doc': updates},
-                refresh='wait_for'
+                body={'doc': updates, '_source': True},
+                refresh=_refresh_param(refresh),
+                if_seq_no=seq_no,
+                if_primary_term=primary_term
             )
-            return self.get_by_id(doc_id)
+            return without_internal_fields(response['get']['_source'])
         except NotFoundError:
             return None
     
-    def delete(self, doc_id: str) -> bool:
+    def bulk_update(self, updates: List[Tuple[str, Dict[str, Any]]], refresh: bool = False) -> int:
+        """Apply partial updates to many documents in a single bulk request"""
+        if not self.client or not updates:
+            return 0
+        self._require_indices()
+        
+        actions = (
+            {'_op_type': 'update', '_index': self.index_name, '_id': doc_id, 'doc': doc}
+            for doc_id, doc in updates
+        )
+        success, _ = bulk(
+            self.client,
+            actions,
+            chunk_size=500,
+            request_timeout=60,
+            refresh=_refresh_param(refresh),
+            raise_on_error=False
+        )
+        return success
+    
+    def delete(self, doc_id: str, refresh: bool = False) -> bool:
         """Delete document"""
         if not self.client:
             return False
@@ -68,14 +241,45 @@ class BaseRepository:
             self.client.delete(
                 index=self.index_name,
                 id=doc_id,
-                refresh='wait_for'
+                refresh=_refresh_param(refresh)
             )
             return True
         except NotFoundError:
             return False
     
-    def search(self, query: Dict[str, Any], size: int = 50) -> List[Dict[str, Any]]:
-        """Search documents"""
+    def search(self, query: Dict[str, Any], size: int = 50, offset: int = 0,
+               source_excludes: Optional[List[str]] = None,
+               source_includes: Optional[List[str]] = None,
+               track_total_hits: bool = False,
+               request_cache: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Search documents
+        
+        Total hits are not counted unless asked for, since callers only use the hits.
+        Pass request_cache=True for filter-only queries that are repeated between refreshes.
+        """
+        if not self.client:
+            return []
+        
+        try:
+            response = self.client.search(
+                index=self.index_name,
+                body=query,
+                size=size,
+                from_=offset,
+                source_excludes=source_excludes,
+                source_includes=source_includes,
+                track_total_hits=track_total_hits,
+                request_cache=request_cache,
+                filter_path=['hits.hits._source']
+            )
+            # filter_path drops the hits key entirely when nothing matched
+            return [hit['_source'] for hit in response.get('hits', {}).get('hits', [])]
+        except Exception as e:
+            print(f"Search error: {e}")
+            return []
+    
+    def search_ids(self, query: Dict[str, Any], size: int = 50) -> List[str]:
+        """Search documents, returning only the IDs of the hits"""
         if not self.client:
             return []
         
@@ -83,31 +287,267 @@ class BaseRepository:
             response = self.client.search(
                 index=self.index_name,
                 body=query,
-                size=size
+                size=size,
+                source=False,
+                track_total_hits=False,
+                filter_path=['hits.hits._id']
             )
-            return [hit['_source'] for hit in response['hits']['hits']]
+            return [hit['_id'] for hit in response.get('hits', {}).get('hits', [])]
         except Exception as e:
             print(f"Search error: {e}")
             return []
 
+    def iter_search(self, query: Dict[str, Any], page_size: int = 500,
+                    keep_alive: str = '1m') -> Iterator[Dict[str, Any]]:
+        """Yield every document matching query, paging with a point in time and search_after
+        
+        Unlike search(), this is not limited by the index's max_result_window and the
+        coordinating node only holds one page at a time. The query's sort is extended
+        with the _shard_doc tiebreaker so pages never skip or repeat documents.
+        """
+        if not self.client:
+            return
+        
+        pit_id = self.client.open_point_in_time(index=self.index_name, keep_alive=keep_alive)['id']
+        body = dict(query)
+        body['sort'] = list(query.get('sort', [])) + [{'_shard_doc': 'asc'}]
+        body['size'] = page_size
+        body['track_total_hits'] = False
+        try:
+            while True:
+                body['pit'] = {'id': pit_id, 'keep_alive': keep_alive}
+                response = self.client.search(body=body)
+                pit_id = response.get('pit_id', pit_id)
+                hits = response['hits']['hits']
+                for hit in hits:
+                    yield hit['_source']
+                if len(hits) < page_size:
+                    break
+                body['search_after'] = hits[-1]['sort']
+        finally:
+            self.client.close_point_in_time(body={'id': pit_id})
+
+class MgetBatcher:
+    """Coalesce concurrent single-document reads on one repository into mget calls"""
+    
+    MAX_BATCH = 100
+    MAX_WAIT = 0.002  # seconds to wait for more ids once a batch has started
+    
+    def __init__(self, repository: BaseRepository):
+        self.repository = repository
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+    
+    def get(self, doc_id: str, timeout: float = 0.5) -> Optional[Dict[str, Any]]:
+        """Get a document, sharing an mget with any concurrent callers"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((doc_id, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # The batch is stuck behind a slow request; read directly instead of waiting
+            return self.repository.get_by_id(doc_id)
+    
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='mget-batcher', daemon=True)
+                self._worker.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.MAX_WAIT
+            while len(batch) < self.MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                docs = self.repository.get_many([doc_id for doc_id, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for doc_id, future in batch:
+                future.set_result(docs.get(doc_id))
+
+# Term-stats cache key for the number of indexed resumes; terms themselves are plain strings
+_RESUME_COUNT_KEY = ('resume_count',)
+
+def _frozen(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a flat document with its lists turned into tuples, so copies of it can share them"""
+    return {key: tuple(value) if isinstance(value, list) else value for key, value in document.items()}
+
 class UserRepository(BaseRepository):
+    # Shared by every instance so an update through one view module
+    # invalidates the entry seen by the auth checks in the others
+    _cache = TTLCache(maxsize=10_000, ttl=60)
+    _cache_lock = threading.Lock()
+    skills_field = 'skills'
+    vector_field = 'resume_vec'
+    
+    # Fields never exposed when one user's profile is shown to another
+    PRIVATE_FIELDS = ['password_hash', 'resume_text', 'resume_vec'] + INTERNAL_FIELDS
+    
+    # Resume document frequencies for BM25 IDF; they drift slowly, so a few minutes' staleness is fine
+    _term_stats_cache = TTLCache(maxsize=50_000, ttl=600)
+    _term_stats_lock = threading.Lock()
+    
     def __init__(self):
         super().__init__(USERS_INDEX)
+        self._batcher = None
+    
+    def get_by_id(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get user by ID, served from a short-lived in-process cache"""
+        return self._get_cached(doc_id, super().get_by_id)
+    
+    def get_by_id_coalesced(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Get user by ID like get_by_id, batching cache misses from concurrent requests into one mget"""
+        return self._get_cached(doc_id, self._loader().get)
+    
+    def _get_cached(self, doc_id: str, fetch) -> Optional[Dict[str, Any]]:
+        # The cached user holds only immutable values, so each caller gets a cheap shallow
+        # copy and changing a returned user can't alter the cached one
+        with self._cache_lock:
+            user = self._cache.get(doc_id)
+        if user is not None:
+            return dict(user)
+        
+        user = fetch(doc_id)
+        if user is None:
+            return None
+        user = _frozen(user)
+        with self._cache_lock:
+            self._cache[doc_id] = user
+        return dict(user)
+    
+    def _loader(self) -> MgetBatcher:
+        with self._cache_lock:
+            if self._batcher is None:
+                self._batcher = MgetBatcher(self)
+            return self._batcher
+    
+    def get_many_public(self, doc_ids) -> Dict[str, Dict[str, Any]]:
+        """Get multiple users with private fields excluded on the Elasticsearch side"""
+        return self.get_many(doc_ids, source_excludes=self.PRIVATE_FIELDS)
+    
+    def invalidate(self, doc_id: str) -> None:
+        """Drop a cached user so the next read goes to Elasticsearch"""
+        with self._cache_lock:
+            self._cache.pop(doc_id, None)
+    
+    def update(self, doc_id: str, updates: Dict[str, Any], seq_no: Optional[int] = None,
+               primary_term: Optional[int] = None, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Update user and refresh the cached copy"""
+        # Evicted again once the write is done, since a read while it was in flight
+        # may have cached the old document
+        self.invalidate(doc_id)
+        try:
+            return super().update(doc_id, updates, seq_no, primary_term, refresh)
+        finally:
+            self.invalidate(doc_id)
+    
+    def delete(self, doc_id: str, refresh: bool = False) -> bool:
+        """Delete user and evict the cached copy"""
+        self.invalidate(doc_id)
+        try:
+            return super().delete(doc_id, refresh)
+        finally:
+            self.invalidate(doc_id)
+    
+    @staticmethod
+    def id_for_email(email: str) -> str:
+        """Document ID for a user, derived from their unique email"""
+        return hashlib.sha1(email.encode('utf-8')).hexdigest()
+    
+    def create(self, document: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
+        """Create a user keyed by their email, so lookups by email are a realtime get"""
+        document['id'] = self.id_for_email(document['email'])
+        return super().create(document, refresh)
     
     def get_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get user by email"""
+        user = self.get_by_id(self.id_for_email(email))
+        if user is not None:
+            return user
+        
+        # Accounts created before IDs were derived from the email still need a search
         query = {
             "query": {
-                "term": {"email.keyword": email}
+                "term": {"email": email}
             }
         }
-        results = self.search(query)
+        results = self.search(query, size=1)
         return results[0] if results else None
     
+    def resume_term_stats(self, terms: Iterable[str]) -> Tuple[int, Dict[str, int]]:
+        """Number of indexed resumes and how many of them contain each term, for BM25 IDF
+        
+        Each term is matched through the resume_text analyzer, so it is counted the way a
+        search would find it; terms the analyzer drops (stop words) count as in every resume.
+        Counts are cached per term, and only uncached terms are looked up, in one request.
+        """
+        terms = set(terms)
+        with self._term_stats_lock:
+            doc_count = self._term_stats_cache.get(_RESUME_COUNT_KEY)
+            doc_freq = {term: self._term_stats_cache[term] for term in terms if term in self._term_stats_cache}
+        
+        missing = [term for term in terms if term not in doc_freq]
+        if doc_count is not None and not missing:
+            return doc_count, doc_freq
+        if not self.client:
+            return 0, {}
+        
+        query = {"query": {"exists": {"field": "resume_text"}}}
+        if missing:
+            query["aggs"] = {
+                "doc_freq": {
+                    "filters": {
+                        "filters": {
+                            term: {"match": {"resume_text": {"query": term, "zero_terms_query": "all"}}}
+                            for term in missing
+                        }
+                    }
+                }
+            }
+        
+        try:
+            response = self.client.search(
+                index=self.index_name,
+                body=query,
+                size=0,
+                track_total_hits=True,
+                request_cache=True,
+                filter_path=['hits.total.value', 'aggregations.doc_freq.buckets.*.doc_count']
+            )
+        except Exception as e:
+            print(f"Search error: {e}")
+            return 0, {}
+        
+        doc_count = response.get('hits', {}).get('total', {}).get('value', 0)
+        buckets = response.get('aggregations', {}).get('doc_freq', {}).get('buckets', {})
+        fetched = {term: buckets.get(term, {}).get('doc_count', 0) for term in missing}
+        with self._term_stats_lock:
+            self._term_stats_cache[_RESUME_COUNT_KEY] = doc_count
+            self._term_stats_cache.update(fetched)
+        
+        doc_freq.update(fetched)
+        return doc_count, doc_freq
+    
     def search_candidates(self, query: str = "", skills: List[str] = None, 
                          location: str = "", min_experience: int = None) -> List[Dict[str, Any]]:
-        """Search for job seekers"""
-        must_clauses = [{"term": {"role": "seeker"}}]
+        """Search for job seekers, returning public profile fields only"""
+        # Only the text match is scored; the rest are cacheable filters
+        must_clauses = []
+        filter_clauses = [{"term": {"role": "seeker"}}]
         
         if query:
             must_clauses.append({
@@ -119,43 +559,55 @@ class UserRepository(BaseRepository):
             })
         
         if skills:
-            must_clauses.append({
+            filter_clauses.append({
                 "terms": {"skills": skills}
             })
         
         if location:
-            must_clauses.append({
-                "term": {"location.keyword": location}
+            filter_clauses.append({
+                "term": {"location": location}
             })
         
         if min_experience is not None:
-            must_clauses.append({
+            filter_clauses.append({
                 "range": {"experience_years": {"gte": min_experience}}
             })
         
         search_query = {
-            "query": {"bool": {"must": must_clauses}},
+            "query": {"bool": {"must": must_clauses, "filter": filter_clauses}},
             "sort": [{"updated_at": {"order": "desc"}}]
         }
         
-        return self.search(search_query, size=100)
+        return self.search(search_query, size=100, source_excludes=self.PRIVATE_FIELDS)
 
 class JobRepository(BaseRepository):
+    skills_field = 'skills_required'
+    vector_field = 'job_vec'
+    
+    # Fields only needed for ranking, dropped when a job is embedded in another payload
+    RANKING_FIELDS = ['job_vec'] + INTERNAL_FIELDS
+    
     def __init__(self):
         super().__init__(JOBS_INDEX)
     
+    def get_many_summaries(self, doc_ids) -> Dict[str, Dict[str, Any]]:
+        """Get multiple jobs without their ranking-only fields"""
+        return self.get_many(doc_ids, source_excludes=self.RANKING_FIELDS)
+    
     def get_by_recruiter(self, recruiter_id: str) -> List[Dict[str, Any]]:
         """Get jobs by recruiter"""
         query = {
-            "query": {"term": {"recruiter_id": recruiter_id}},
+            "query": {"bool": {"filter": [{"term": {"recruiter_id": recruiter_id}}]}},
             "sort": [{"created_at": {"order": "desc"}}]
         }
-        return self.search(query)
+        return self.search(query, source_excludes=INTERNAL_FIELDS, request_cache=True)
     
     def search_jobs(self, query: str = "", location: str = "", 
                    employment_type: str = "") -> List[Dict[str, Any]]:
         """Search open jobs"""
-        must_clauses = [{"term": {"status": "open"}}]
+        # Only the text match is scored; the rest are cacheable filters
+        must_clauses = []
+        filter_clauses = [{"term": {"status": "open"}}]
         
         if query:
             must_clauses.append({
@@ -167,29 +619,42 @@ class JobRepository(BaseRepository):
             })
         
         if location:
-            must_clauses.append({
-                "term": {"location.keyword": location}
+            filter_clauses.append({
+                "term": {"location": location}
             })
         
         if employment_type:
-            must_clauses.append({
+            filter_clauses.append({
                 "term": {"employment_type": employment_type}
             })
         
         search_query = {
-            "query": {"bool": {"must": must_clauses}},
+            "query": {"bool": {"must": must_clauses, "filter": filter_clauses}},
             "sort": [{"created_at": {"order": "desc"}}]
         }
         
         return self.search(search_query, size=100)
     
+    def knn_open_jobs(self, query_vec: List[float], k: int = 50) -> List[Dict[str, Any]]:
+        """Get the k open jobs whose embeddings are nearest to query_vec (approximate HNSW search)"""
+        query = {
+            "knn": {
+                "field": "job_vec",
+                "query_vector": query_vec,
+                "k": k,
+                "num_candidates": k * 4,
+                "filter": {"term": {"status": "open"}}
+            }
+        }
+        return self.search(query, size=k)
+    
     def get_open_jobs(self) -> List[Dict[str, Any]]:
         """Get all open jobs"""
         query = {
-            "query": {"term": {"status": "open"}},
+            "query": {"bool": {"filter": [{"term": {"status": "open"}}]}},
             "sort": [{"created_at": {"order": "desc"}}]
         }
-        return self.search(query, size=200)
+        return self.search(query, size=200, source_excludes=INTERNAL_FIELDS, request_cache=True)
 
 class ApplicationRepository(BaseRepository):
     def __init__(self):
@@ -203,13 +668,21 @@ class ApplicationRepository(BaseRepository):
         }
         return self.search(query)
     
-    def get_by_job(self, job_id: str) -> List[Dict[str, Any]]:
-        """Get applications for a job"""
+    def get_by_job(self, job_id: str, sort_by: str = 'scores.final', order: str = 'desc',
+                   size: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get applications for a job, sorted and paginated by Elasticsearch"""
         query = {
             "query": {"term": {"job_id": job_id}},
-            "sort": [{"scores.final": {"order": "desc"}}]
+            "sort": [{sort_by: {"order": order}}]
         }
-        return self.search(query)
+        return self.search(query, size=size, offset=offset)
+    
+    def iter_by_job(self, job_id: str, fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield every application for a job, however many there are"""
+        query = {"query": {"term": {"job_id": job_id}}}
+        if fields:
+            query["_source"] = fields
+        return self.iter_search(query)
     
     def get_by_jobs(self, job_ids: List[str]) -> List[Dict[str, Any]]:
         """Get applications for multiple jobs"""
@@ -219,20 +692,45 @@ class ApplicationRepository(BaseRepository):
         }
         return self.search(query)
     
+    @staticmethod
+    def id_for(job_id: str, seeker_id: str) -> str:
+        """Document ID for an application; a seeker applies to a job at most once"""
+        return f"{job_id}:{seeker_id}"
+    
+    def create(self, document: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
+        """Create an application keyed by its job and seeker"""
+        document['id'] = self.id_for(document['job_id'], document['seeker_id'])
+        return super().create(document, refresh)
+    
     def get_by_job_and_seeker(self, job_id: str, seeker_id: str) -> Optional[Dict[str, Any]]:
         """Get application by job and seeker"""
-        query = {
+        application = self.get_by_id(self.id_for(job_id, seeker_id))
+        if application is not None:
+            return application
+        
+        # Applications created before IDs were derived from job and seeker still need a search
+        results = self.search(self._job_and_seeker_query(job_id, seeker_id), size=1)
+        return results[0] if results else None
+    
+    def exists_for_job_and_seeker(self, job_id: str, seeker_id: str) -> bool:
+        """Whether the seeker has already applied to the job, without fetching the application"""
+        if self.client and self.client.exists(index=self.index_name, id=self.id_for(job_id, seeker_id)):
+            return True
+        
+        return bool(self.search_ids(self._job_and_seeker_query(job_id, seeker_id), size=1))
+    
+    @staticmethod
+    def _job_and_seeker_query(job_id: str, seeker_id: str) -> Dict[str, Any]:
+        return {
             "query": {
                 "bool": {
-                    "must": [
+                    "filter": [
                         {"term": {"job_id": job_id}},
                         {"term": {"seeker_id": seeker_id}}
                     ]
                 }
             }
         }
-        results = self.search(query)
-        return results[0] if results else None
 
 class InterviewRepository(BaseRepository):
     def __init__(self):
@@ -259,7 +757,7 @@ class InterviewRepository(BaseRepository):
         query = {
             "query": {
                 "bool": {
-                    "must": [
+                    "filter": [
                         {"term": {"recruiter_id": recruiter_id}},
                         {
                             "range": {
@@ -281,7 +779,7 @@ class InterviewRepository(BaseRepository):
         query = {
             "query": {
                 "bool": {
-                    "must": [
+                    "filter": [
                         {"term": {"seeker_id": seeker_id}},
                         {
                             "range": {
@@ -298,6 +796,25 @@ class InterviewRepository(BaseRepository):
         }
         return self.search(query)
 
+    def get_busy_intervals(self, user_field: str, user_id: str, start_date: datetime, end_date: datetime,
+                           limit: int = 1000) -> List[Dict[str, Any]]:
+        """Get start/end times of a user's non-cancelled interviews overlapping a date range"""
+        query = {
+            "query": {
+                "bool": {
+                    "filter": [
+                        {"term": {user_field: user_id}},
+                        {"range": {"start_time": {"lt": end_date.isoformat()}}},
+                        {"range": {"end_time": {"gt": start_date.isoformat()}}}
+                    ],
+                    "must_not": [{"term": {"status": "cancelled"}}]
+                }
+            },
+            "_source": ["start_time", "end_time"],
+            "sort": [{"start_time": {"order": "asc"}}]
+        }
+        return self.search(query, size=limit)
+
 class EventRepository(BaseRepository):
     def __init__(self):
         super().__init__(EVENTS_INDEX)
@@ -305,7 +822,7 @@ class EventRepository(BaseRepository):
     def log_event(self, actor_id: str, event_type: str, payload: Dict[str, Any]) -> Dict[str, Any]:
         """Log an event"""
         event = {
-            "id": str(uuid.uuid4()),
+            "id": uuid.uuid4().hex,
             "actor_id": actor_id,
             "type": event_type,
             "payload": payload,
@@ -316,7 +833,7 @@ class EventRepository(BaseRepository):
     def get_events_by_actor(self, actor_id: str, limit: int = 100) -> List[Dict[str, Any]]:
         """Get events by actor"""
         query = {
-            "query": {"term": {"actor_id": actor_id}},
+            "query": {"bool": {"filter": [{"term": {"actor_id": actor_id}}]}},
             "sort": [{"ts": {"order": "desc"}}]
         }
         return self.search(query, size=limit)
@@ -324,7 +841,67 @@ class EventRepository(BaseRepository):
     def get_events_by_type(self, event_type: str, limit: int = 100) -> List[Dict[str, Any]]:
         """Get events by type"""
         query = {
-            "query": {"term": {"type": event_type}},
+            "query": {"bool": {"filter": [{"term": {"type": event_type}}]}},
             "sort": [{"ts": {"order": "desc"}}]
         }
-        return self.search(query, size=limit)
+        return self.search(query, size=limit, request_cache=True)
+
+class MessageRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(MESSAGES_INDEX)
+    
+    def bulk_create(self, messages: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], int]]:
+        """Index a batch of chat messages without waiting for a refresh
+        
+        Returns the messages Elasticsearch rejected, each with the HTTP status of its failure.
+        """
+        if not self.client:
+            raise Exception("Elasticsearch client not available")
+        if not messages:
+            return []
+        self._require_indices()
+        
+        actions = (
+            {'_index': self.index_name, '_id': message['id'], '_source': message}
+            for message in messages
+        )
+        _, errors = bulk(self.client, actions, chunk_size=500, raise_on_error=False)
+        
+        by_id = {message['id']: message for message in messages}
+        failures = []
+        for error in errors:
+            item = next(iter(error.values()))
+            if item.get('_id') in by_id:
+                failures.append((by_id[item['_id']], item.get('status', 500)))
+        return failures
+    
+    def get_by_application(self, application_id: str, after: Optional[str] = None,
+                           limit: int = 100) -> List[Dict[str, Any]]:
+        """Get chat messages for an application, oldest first
+        
+        Without after, this is the newest limit messages; with after, the first limit
+        messages after that timestamp, so polling can continue from the last one.
+        """
+        filter_clauses = [{"term": {"application_id": application_id}}]
+        
+        if after:
+            filter_clauses.append({
+                "range": {"timestamp": {"gt": after}}
+            })
+            query = {
+                "query": {"bool": {"filter": filter_clauses}},
+                "sort": [{"timestamp": {"order": "asc"}}]
+            }
+            return self.search(query, size=limit)
+        
+        # Take the newest page and put it back in chronological order
+        query = {
+            "query": {"bool": {"filter": filter_clauses}},
+            "sort": [{"timestamp": {"order": "desc"}}]
+        }
+        messages = self.search(query, size=limit)
+        messages.reverse()
+        return messages
+
+# Shared instance so every module uses one user cache and one lookup batcher
+user_repo = UserRepository()
@@ -41,8 +41,8 @@ def main():
         
         # Check system status
         elif command == 'status':
+            from importlib.util import find_spec
             from es.client import check_elasticsearch_connection
-            from ml.embeddings import EmbeddingGenerator
             
             print("=== AI Talent Match System Status ===")
             
@@ -56,11 +56,22 @@ def main():
             # Check ML models
             print("\n2. ML Models:")
             try:
-                embedding_gen = EmbeddingGenerator()
-                if embedding_gen.is_model_available():
-                    print("   ✓ Embedding model available")
+                # Look for the downloaded model instead of loading it, which takes seconds
+                model_name = os.environ.get('SENTENCE_TRANSFORMER_MODEL', 'all-MiniLM-L6-v2')
+                cache_root = os.environ.get('SENTENCE_TRANSFORMERS_HOME') or os.path.join(
+                    os.environ.get('TORCH_HOME') or os.path.join(os.path.expanduser('~'), '.cache', 'torch'),
+                    'sentence_transformers'
+                )
+                hub_id = model_name if '/' in model_name else f'sentence-transformers/{model_name}'
+                model_cached = os.path.isdir(model_name) or os.path.isdir(
+                    os.path.join(cache_root, hub_id.replace('/', '_'))
+                )
+                if find_spec('sentence_transformers') is None:
+                    print("   ⚠ SentenceTransformers not installed, using fallback embedding method")
+                elif model_cached:
+                    print(f"   ✓ Embedding model {model_name} available")
                 else:
-                    print("   ⚠ Using fallback embedding method")
+                    print(f"   ⚠ Embedding model {model_name} not downloaded yet (fetched on first use)")
             except Exception as e:
                 print(f"   ✗ Error: {e}")
             
@@ -79,6 +90,21 @@ def main():
             print("\n=== End Status ===")
             return
         
+        # Export the embedding model for ONNX Runtime (enable with USE_ONNX=1)
+        elif command == 'export_onnx':
+            from ml.onnx_embed import DEFAULT_ONNX_DIR, export_onnx_model
+            
+            model_name = os.environ.get('SENTENCE_TRANSFORMER_MODEL', 'all-MiniLM-L6-v2')
+            output_dir = os.environ.get('ONNX_MODEL_DIR', DEFAULT_ONNX_DIR)
+            print(f"Exporting {model_name} to {output_dir}...")
+            try:
+                model_path = export_onnx_model(model_name, output_dir)
+                print(f"✓ Exported {model_path}")
+            except Exception as e:
+                print(f"✗ Export failed: {e}")
+                sys.exit(1)
+            return
+        
         # Load sample data (for development)
         elif command == 'load_sample_data':
             print("Loading sample data...")
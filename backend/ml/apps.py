@@ -1,20 +1,26 @@
+import threading
+
 from django.apps import AppConfig
 
 
+def _warm_up_embeddings():
+    """Load the shared embedding generator so the first request doesn't pay for it"""
+    try:
+        from .embeddings import get_embedding_generator
+        embedding_gen = get_embedding_generator()
+        if embedding_gen.is_model_available():
+            print("ML: Embedding model loaded successfully")
+        else:
+            print("ML: Using fallback embedding method")
+    except Exception as e:
+        print(f"ML: Warning - Failed to initialize embedding model: {e}")
+
+
 class MlConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml'
     verbose_name = 'Machine Learning'
 
     def ready(self):
-        """Initialize ML components when app is ready"""
-        try:
-            from .embeddings import EmbeddingGenerator
-            # Initialize embedding generator to download models if needed
-            embedding_gen = EmbeddingGenerator()
-            if embedding_gen.is_model_available():
-                print("ML: Embedding model loaded successfully")
-            else:
-                print("ML: Using fallback embedding method")
-        except Exception as e:
-            print(f"ML: Warning - Failed to initialize embedding model: {e}")
+        """Load the embedding model in the background so workers accept traffic immediately"""
+        threading.Thread(target=_warm_up_embeddings, name='ml-warmup', daemon=True).start()
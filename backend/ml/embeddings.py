@@ -1,28 +1,59 @@
+import hashlib
 import numpy as np
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
 from typing import List, Union
 import os
 
+from cachetools import LRUCache
+
 try:
     from sentence_transformers import SentenceTransformer
     SENTENCE_TRANSFORMERS_AVAILABLE = True
 except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
 
+@lru_cache(maxsize=None)
+def _load_model(model_name: str):
+    """Load a SentenceTransformer model once per process, or None when unavailable"""
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        print("SentenceTransformers not available. Using fallback embedding.")
+        return None
+    
+    try:
+        # Cap intra-op threads so several worker processes don't oversubscribe the CPUs
+        torch_threads = os.environ.get('TORCH_THREADS')
+        if torch_threads:
+            import torch
+            torch.set_num_threads(int(torch_threads))
+        
+        model = SentenceTransformer(model_name)
+        print(f"Loaded SentenceTransformer model: {model_name}")
+        return model
+    except Exception as e:
+        print(f"Failed to load SentenceTransformer model: {e}")
+        return None
+
+# Model outputs keyed by (model name, digest of the preprocessed text); values are
+# float tuples so a caller mutating its list can't corrupt the cached copy
+_EMBEDDING_CACHE = LRUCache(maxsize=4096)
+_EMBEDDING_CACHE_LOCK = threading.Lock()
+
 class EmbeddingGenerator:
     def __init__(self, model_name: str = None):
         self.model_name = model_name or os.environ.get('SENTENCE_TRANSFORMER_MODEL', 'all-MiniLM-L6-v2')
-        self.model = None
         self.embedding_dim = int(os.environ.get('EMBEDDING_DIMENSION', '384'))
-        
-        if SENTENCE_TRANSFORMERS_AVAILABLE:
-            try:
-                self.model = SentenceTransformer(self.model_name)
-                print(f"Loaded SentenceTransformer model: {self.model_name}")
-            except Exception as e:
-                print(f"Failed to load SentenceTransformer model: {e}")
-                self.model = None
-        else:
-            print("SentenceTransformers not available. Using fallback embedding.")
+        # None lets sentence-transformers pick the device (CUDA when available)
+        self.device = os.environ.get('EMB_DEVICE') or None
+        self.model = None
+        if os.environ.get('USE_ONNX') == '1':
+            from .onnx_embed import load_onnx_model
+            self.model = load_onnx_model()
+        if self.model is None:
+            self.model = _load_model(self.model_name)
     
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for given text"""
@@ -33,12 +64,21 @@ class EmbeddingGenerator:
             try:
                 # Clean and preprocess text
                 cleaned_text = self._preprocess_text(text)
+                cache_key = (
+                    self.model_name,
+                    hashlib.blake2b(cleaned_text.encode('utf-8'), digest_size=16).digest()
+                )
+                with _EMBEDDING_CACHE_LOCK:
+                    cached = _EMBEDDING_CACHE.get(cache_key)
+                if cached is not None:
+                    return list(cached)
                 
                 # Generate embedding
-                embedding = self.model.encode(cleaned_text)
+                embedding = tuple(self.model.encode(cleaned_text).tolist())
+                with _EMBEDDING_CACHE_LOCK:
+                    _EMBEDDING_CACHE[cache_key] = embedding
                 
-                # Ensure it's a list of floats
-                return embedding.tolist()
+                return list(embedding)
                 
             except Exception as e:
                 print(f"Error generating embedding: {e}")
@@ -46,43 +86,49 @@ class EmbeddingGenerator:
         else:
             return self._fallback_embedding(text)
     
-    def generate_batch_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a batch of texts"""
+    def generate_batch_embeddings(self, texts: List[str],
+                                  as_list: bool = False) -> Union[np.ndarray, List[List[float]]]:
+        """Generate embeddings for a batch of texts as one (N, dim) float32 array
+        
+        Pass as_list=True only where the vectors leave for JSON, e.g. repository writes.
+        """
+        if not texts:
+            return [] if as_list else np.zeros((0, self.embedding_dim), dtype=np.float32)
+        
+        embeddings = None
         if self.model is not None:
             try:
                 # Clean and preprocess texts
                 cleaned_texts = [self._preprocess_text(text) for text in texts]
                 
                 # Generate embeddings
-                embeddings = self.model.encode(cleaned_texts)
-                
-                # Convert to list of lists
-                return [emb.tolist() for emb in embeddings]
+                embeddings = self.model.encode(
+                    cleaned_texts,
+                    batch_size=64,
+                    show_progress_bar=False,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,
+                    device=self.device
+                )
                 
             except Exception as e:
                 print(f"Error generating batch embeddings: {e}")
-                return [self._fallback_embedding(text) for text in texts]
-        else:
-            return [self._fallback_embedding(text) for text in texts]
+        
+        if embeddings is None:
+            embeddings = np.array([self._fallback_embedding(text) for text in texts], dtype=np.float32)
+        
+        return embeddings.tolist() if as_list else embeddings
     
     def _preprocess_text(self, text: str) -> str:
         """Preprocess text before embedding generation"""
         if not text:
             return ""
         
-        # Basic cleaning
-        text = text.strip()
-        
-        # Remove excessive whitespace
-        text = ' '.join(text.split())
-        
-        # Truncate if too long (most models have token limits)
+        # Collapse whitespace and truncate (most models have token limits) in one split;
+        # maxsplit stops scanning after the first max_length words
         max_length = 500  # Approximate token limit
-        words = text.split()
-        if len(words) > max_length:
-            text = ' '.join(words[:max_length])
-        
-        return text
+        words = text.split(None, max_length)
+        return ' '.join(words[:max_length])
     
     def _fallback_embedding(self, text: str) -> List[float]:
         """Generate a simple fallback embedding when the model is not available"""
@@ -92,30 +138,31 @@ class EmbeddingGenerator:
         words = text.lower().split()
         
         # Create a basic feature vector
-        features = [0.0] * self.embedding_dim
+        features = np.zeros(self.embedding_dim, dtype=np.float32)
         
         if words:
-            # Simple hash-based features
-            for i, word in enumerate(words[:50]):  # Limit to first 50 words
-                hash_val = hash(word) % self.embedding_dim
-                features[hash_val] += 1.0 / len(words)
+            # Simple hash-based features over the first 50 words, accumulated in one call
+            head = words[:50]
+            buckets = np.fromiter(map(hash, head), dtype=np.int64, count=len(head)) % self.embedding_dim
+            np.add.at(features, buckets, 1.0 / len(words))
         
         # Normalize
         norm = np.linalg.norm(features)
         if norm > 0:
-            features = [f / norm for f in features]
+            features /= norm
         
-        return features
+        return features.tolist()
     
-    def cosine_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
+    def cosine_similarity(self, embedding1: Union[List[float], np.ndarray],
+                          embedding2: Union[List[float], np.ndarray]) -> float:
         """Calculate cosine similarity between two embeddings"""
-        if not embedding1 or not embedding2:
+        if is_empty_vector(embedding1) or is_empty_vector(embedding2):
             return 0.0
         
         try:
-            # Convert to numpy arrays
-            vec1 = np.array(embedding1)
-            vec2 = np.array(embedding2)
+            # float32 like the stored vectors; float32 arrays are used without a copy
+            vec1 = np.asarray(embedding1, dtype=np.float32)
+            vec2 = np.asarray(embedding2, dtype=np.float32)
             
             # Calculate cosine similarity
             dot_product = np.dot(vec1, vec2)
@@ -128,7 +175,7 @@ class EmbeddingGenerator:
             similarity = dot_product / (norm1 * norm2)
             
             # Ensure result is between -1 and 1
-            return max(-1.0, min(1.0, similarity))
+            return max(-1.0, min(1.0, float(similarity)))
             
         except Exception as e:
             print(f"Error calculating cosine similarity: {e}")
@@ -137,17 +184,30 @@ class EmbeddingGenerator:
     def find_most_similar(self, query_embedding: List[float], 
                          candidate_embeddings: List[List[float]], 
                          top_k: int = 5) -> List[tuple]:
-        """Find the most similar embeddings to a query embedding"""
-        similarities = []
+        """Find the most similar embeddings to a query embedding
         
-        for i, candidate_embedding in enumerate(candidate_embeddings):
-            similarity = self.cosine_similarity(query_embedding, candidate_embedding)
-            similarities.append((i, similarity))
+        For stored users and jobs, use the repositories' kNN searches instead so
+        Elasticsearch ranks them without shipping every embedding to Python.
+        """
+        if not len(candidate_embeddings):
+            return []
         
-        # Sort by similarity (descending)
-        similarities.sort(key=lambda x: x[1], reverse=True)
+        # An empty query is equally (un)similar to everything
+        if is_empty_vector(query_embedding):
+            return [(i, 0.0) for i in range(min(top_k, len(candidate_embeddings)))]
         
-        return similarities[:top_k]
+        dim = len(query_embedding)
+        query = _unit_rows([query_embedding], dim)[0]
+        similarities = np.clip(_unit_rows(candidate_embeddings, dim) @ query, -1.0, 1.0)
+        
+        # Select the top k in linear time, then order just those; equal scores keep
+        # their original order (which of several tied at the cut-off is kept is arbitrary)
+        k = min(top_k, len(similarities))
+        if k <= 0:
+            return []
+        top = np.argpartition(-similarities, k - 1)[:k] if k < len(similarities) else np.arange(k)
+        top = top[np.lexsort((top, -similarities[top]))]
+        return [(int(i), float(similarities[i])) for i in top]
     
     def get_embedding_dimension(self) -> int:
         """Get the dimension of embeddings generated by this model"""
@@ -157,47 +217,109 @@ class EmbeddingGenerator:
         """Check if the embedding model is available"""
         return self.model is not None
 
+@lru_cache(maxsize=1)
+def get_embedding_generator() -> EmbeddingGenerator:
+    """Shared EmbeddingGenerator for the default model, created on first use"""
+    return EmbeddingGenerator()
+
+class EmbeddingBatcher:
+    """Coalesce embedding requests from concurrent callers into batched model calls"""
+    
+    MAX_BATCH = 32
+    MAX_WAIT = 0.005  # seconds to wait for more texts once a batch has started
+    
+    def __init__(self, generator: EmbeddingGenerator):
+        self.generator = generator
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+    
+    def embed(self, text: str) -> List[float]:
+        """Generate an embedding, sharing a model call with any concurrent requests"""
+        # Without a model there is nothing to amortize
+        if not self.generator.is_model_available() or not text or not text.strip():
+            return self.generator.generate_embedding(text)
+        
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+    
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._worker.start()
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.MAX_WAIT
+            while len(batch) < self.MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            try:
+                embeddings = self.generator.generate_batch_embeddings([text for text, _ in batch], as_list=True)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+@lru_cache(maxsize=1)
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """Shared EmbeddingBatcher around the default generator"""
+    return EmbeddingBatcher(get_embedding_generator())
+
+def is_empty_vector(vec) -> bool:
+    """True for a missing or zero-length vector, whether a list or an ndarray"""
+    return vec is None or len(vec) == 0
+
+def _unit_rows(embeddings: List[List[float]], dim: int = None) -> np.ndarray:
+    """Stack embeddings into a float32 matrix of unit rows; empty or zero vectors stay zero"""
+    if dim is None:
+        dim = max((len(embedding) for embedding in embeddings if not is_empty_vector(embedding)), default=0)
+    matrix = np.zeros((len(embeddings), dim), dtype=np.float32)
+    for i, embedding in enumerate(embeddings):
+        if not is_empty_vector(embedding):
+            matrix[i] = embedding
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
 # Utility functions for common embedding operations
 def calculate_similarity_matrix(embeddings: List[List[float]]) -> List[List[float]]:
     """Calculate similarity matrix for a list of embeddings"""
-    generator = EmbeddingGenerator()
-    n = len(embeddings)
-    similarity_matrix = [[0.0] * n for _ in range(n)]
-    
-    for i in range(n):
-        for j in range(i, n):
-            if i == j:
-                similarity_matrix[i][j] = 1.0
-            else:
-                sim = generator.cosine_similarity(embeddings[i], embeddings[j])
-                similarity_matrix[i][j] = sim
-                similarity_matrix[j][i] = sim
-    
-    return similarity_matrix
+    unit = _unit_rows(embeddings)
+    similarity_matrix = np.clip(unit @ unit.T, -1.0, 1.0)
+    np.fill_diagonal(similarity_matrix, 1.0)
+    return similarity_matrix.tolist()
 
 def cluster_embeddings(embeddings: List[List[float]], threshold: float = 0.7) -> List[List[int]]:
     """Simple clustering of embeddings based on similarity threshold"""
-    generator = EmbeddingGenerator()
+    unit = _unit_rows(embeddings)
+    similarity_matrix = unit @ unit.T
     n = len(embeddings)
     clusters = []
-    used = [False] * n
+    used = np.zeros(n, dtype=bool)
     
     for i in range(n):
         if used[i]:
             continue
         
-        cluster = [i]
+        # Every earlier embedding is already clustered, so this only picks up later ones
         used[i] = True
+        members = np.flatnonzero(~used & (similarity_matrix[i] >= threshold))
+        used[members] = True
         
-        for j in range(i + 1, n):
-            if used[j]:
-                continue
-            
-            similarity = generator.cosine_similarity(embeddings[i], embeddings[j])
-            if similarity >= threshold:
-                cluster.append(j)
-                used[j] = True
-        
-        clusters.append(cluster)
+        clusters.append([i] + members.tolist())
     
     return clusters
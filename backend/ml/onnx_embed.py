@@ -0,0 +1,110 @@
+"""Sentence embeddings on ONNX Runtime, as a drop-in for SentenceTransformer.encode
+
+Export the model once with `python manage.py export_onnx`, then set USE_ONNX=1.
+Needs the optional onnxruntime and optimum packages.
+"""
+import os
+from functools import lru_cache
+from typing import List, Union
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Anchored to the backend directory so the export and the servers agree whatever their working directory
+DEFAULT_ONNX_DIR = str(settings.BASE_DIR / 'onnx')
+MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model-int8.onnx'
+MAX_SEQ_LENGTH = 256
+
+def _hub_model_id(model_name: str) -> str:
+    """Short sentence-transformers names live under the sentence-transformers org on the hub"""
+    return model_name if '/' in model_name else f'sentence-transformers/{model_name}'
+
+def export_onnx_model(model_name: str, output_dir: str = DEFAULT_ONNX_DIR, quantize: bool = True) -> str:
+    """Export a sentence-transformers model to ONNX, optionally with an INT8 copy; returns the model path"""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    
+    model_id = _hub_model_id(model_name)
+    ORTModelForFeatureExtraction.from_pretrained(model_id, export=True).save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(output_dir)
+    
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    if not quantize:
+        return model_path
+    
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+class OnnxEmbeddingModel:
+    """Tokenizer plus ONNX session with mean pooling, matching the encode() calls EmbeddingGenerator makes"""
+    
+    def __init__(self, model_dir: str):
+        # Prefer the INT8 model when it has been exported
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE)
+        if not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, MODEL_FILE)
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = [
+            provider for provider in ('CUDAExecutionProvider', 'CPUExecutionProvider')
+            if provider in ort.get_available_providers()
+        ]
+        
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.model_path = model_path
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 64,
+               normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        """Embed one text (1-D result) or a list of texts (2-D result) as float32"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        
+        batches = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        
+        if normalize_embeddings and len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        
+        return embeddings[0] if single else embeddings
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=MAX_SEQ_LENGTH, return_tensors='np'
+        )
+        feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, feeds)[0]
+        
+        # Mean over real tokens, as the sentence-transformers pooling layer does
+        mask = encoded['attention_mask'][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        return (summed / np.clip(mask.sum(axis=1), 1e-9, None)).astype(np.float32)
+
+@lru_cache(maxsize=None)
+def load_onnx_model(model_dir: str = None):
+    """Load the exported ONNX model once per process, or None when unavailable"""
+    if not ONNX_AVAILABLE:
+        print("onnxruntime not available. Falling back to SentenceTransformers.")
+        return None
+    
+    model_dir = model_dir or os.environ.get('ONNX_MODEL_DIR', DEFAULT_ONNX_DIR)
+    try:
+        model = OnnxEmbeddingModel(model_dir)
+        print(f"Loaded ONNX embedding model: {model.model_path}")
+        return model
+    except Exception as e:
+        print(f"Failed to load ONNX embedding model: {e}")
+        return None
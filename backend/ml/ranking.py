@@ -1,24 +1,99 @@
+import heapq
 import math
 import re
-from typing import List, Dict, Any, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 from collections import Counter
+from functools import lru_cache
 import numpy as np
+from django.conf import settings
 
-from .embeddings import EmbeddingGenerator
+from es.repositories import user_repo
+from .embeddings import EmbeddingGenerator, get_embedding_generator, is_empty_vector
+
+# BM25 tokenization constants, built once at import
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+_STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with',
+    'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had',
+    'will', 'would', 'could', 'should', 'may', 'might', 'can', 'must', 'shall'
+})
+
+def normalized_location(doc: Dict[str, Any]) -> str:
+    """Lowercased location, using the value precomputed at write time when present"""
+    if 'location_lc' in doc:
+        return doc['location_lc']
+    return (doc.get('location') or '').lower()
+
+def normalized_skills(doc: Dict[str, Any], skills_field: str) -> frozenset:
+    """Lowercased skill set, using the value precomputed at write time when present"""
+    if 'skills_set' in doc:
+        return frozenset(doc['skills_set'])
+    return frozenset(skill.lower() for skill in doc.get(skills_field) or [])
 
 class RankingService:
-    def __init__(self):
-        self.embedding_generator = EmbeddingGenerator()
-        
-        # Weights for hybrid scoring
-        self.bm25_weight = 0.4
-        self.semantic_weight = 0.5
-        self.rule_boost_weight = 0.1
+    def __init__(self, term_stats: Optional[Callable[[Iterable[str]], Tuple[int, Dict[str, int]]]] = None):
+        """term_stats maps terms to (document count, document frequency per term) over the resume
+        corpus, for BM25 IDF; without it every term is weighted alike
+        """
+        self.term_stats = term_stats
+        
+        # Weights for hybrid scoring, read from settings once per service
+        weights = settings.RANKING_WEIGHTS
+        self.bm25_weight = weights['bm25']
+        self.semantic_weight = weights['semantic']
+        self.rule_boost_weight = weights['rule_boost']
+        self._combine_scores = self._scores_combiner(self.bm25_weight, self.semantic_weight, self.rule_boost_weight)
         
         # BM25 parameters
         self.k1 = 1.5
         self.b = 0.75
     
+    @property
+    def embedding_generator(self) -> EmbeddingGenerator:
+        """Shared embedding generator, loaded on first access"""
+        return get_embedding_generator()
+    
+    def score(self,
+              resume_text: str,
+              resume_vec: List[float],
+              job_text: str,
+              job_vec: List[float],
+              resume_skills: List[str],
+              job_skills: List[str],
+              resume_exp: Optional[int] = None,
+              job_min_exp: Optional[int] = None,
+              same_location: bool = False) -> Dict[str, float]:
+        """Calculate every ranking component once and return them with the final hybrid score"""
+        
+        # Calculate individual scores
+        bm25_score = self.calculate_bm25_score(resume_text, job_text)
+        semantic_score = self.calculate_semantic_score(resume_vec, job_vec)
+        rule_boost = self.calculate_rule_boost(resume_skills, job_skills, resume_exp, job_min_exp, same_location)
+        
+        return {
+            'bm25': bm25_score,
+            'semantic': semantic_score,
+            'rule_boost': rule_boost,
+            'final': self._combine_scores(bm25_score, semantic_score, rule_boost)
+        }
+    
+    @staticmethod
+    def _scores_combiner(bm25_weight: float, semantic_weight: float, rule_boost_weight: float):
+        """Build the function combining component scores, with the hybrid weights bound as closure
+        constants rather than read off the instance on every call
+        """
+        def combine_scores(bm25_score: float, semantic_score: float, rule_boost: float) -> float:
+            final_score = (
+                bm25_weight * bm25_score +
+                semantic_weight * semantic_score +
+                rule_boost_weight * rule_boost
+            )
+            
+            # Ensure score is between 0 and 1
+            return max(0.0, min(1.0, final_score))
+        
+        return combine_scores
+    
     def calculate_hybrid_score(self,
                              resume_text: str,
                              resume_vec: List[float],
@@ -30,75 +105,189 @@ class RankingService:
                              job_min_exp: Optional[int] = None,
                              same_location: bool = False) -> float:
         """Calculate the final hybrid score combining all ranking factors"""
-        
-        # Calculate individual scores
-        bm25_score = self.calculate_bm25_score(resume_text, job_text)
-        semantic_score = self.calculate_semantic_score(resume_vec, job_vec)
-        rule_boost = self.calculate_rule_boost(resume_skills, job_skills, resume_exp, job_min_exp, same_location)
-        
-        # Combine scores with weights
-        final_score = (
-            self.bm25_weight * bm25_score +
-            self.semantic_weight * semantic_score +
-            self.rule_boost_weight * rule_boost
-        )
-        
-        # Ensure score is between 0 and 1
-        return max(0.0, min(1.0, final_score))
+        return self.score(
+            resume_text, resume_vec, job_text, job_vec,
+            resume_skills, job_skills, resume_exp, job_min_exp, same_location
+        )['final']
     
     def calculate_bm25_score(self, resume_text: str, job_text: str) -> float:
         """Calculate BM25 score between resume and job description"""
         if not resume_text or not job_text:
             return 0.0
         
-        # Preprocess texts
-        resume_tokens = self._tokenize_and_clean(resume_text)
-        job_tokens = self._tokenize_and_clean(job_text)
+        job_doc = self._prepare_doc(job_text)
+        q_idf, max_cap = self._query_weights(job_doc, *self._corpus_stats(job_doc[2]))
+        return self._bm25_from_prepared(self._prepare_doc(resume_text), job_doc, q_idf, max_cap)
+    
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _prepare_doc(text: str) -> Tuple[int, Counter, frozenset]:
+        """Token count, term frequencies and term set of a text, cached since the same job
+        or resume text is scored against many counterparts (treat the result as read-only)
+        """
+        tokens = RankingService._tokenize_and_clean(text)
+        return len(tokens), Counter(tokens), frozenset(tokens)
+    
+    def _corpus_stats(self, terms: Iterable[str]) -> Tuple[int, Dict[str, int]]:
+        """Resume corpus statistics for terms, or an empty corpus when none are available"""
+        if self.term_stats is None:
+            return 0, {}
+        return self.term_stats(terms)
+    
+    def _query_weights(self, job_doc: Tuple[int, Counter, frozenset], doc_count: int,
+                       doc_freq: Dict[str, int]) -> Tuple[Dict[str, float], float]:
+        """IDF of each job term over the resume corpus, and the score a perfect match would get
+        
+        Computed once per job and shared by every resume scored against it. Neither depends
+        on which other resumes are scored alongside, so a pair scores the same in any batch.
+        The cap is the job text's BM25 score against itself: a resume identical to the job
+        scores 1.0 and scores are comparable across job lengths.
+        """
+        _, job_tf, query_terms = job_doc
+        
+        # Lucene-style IDF, which stays positive however common a term is
+        q_idf = {}
+        for term in query_terms:
+            freq = min(doc_freq.get(term, 0), doc_count)
+            q_idf[term] = math.log(1 + (doc_count - freq + 0.5) / (freq + 0.5))
         
-        if not resume_tokens or not job_tokens:
+        max_cap = sum(
+            idf * job_tf[term] * (self.k1 + 1) / (job_tf[term] + self.k1)
+            for term, idf in q_idf.items()
+        )
+        return q_idf, max_cap
+    
+    def _bm25_from_prepared(self, resume_doc: Tuple[int, Counter, frozenset],
+                            job_doc: Tuple[int, Counter, frozenset],
+                            q_idf: Dict[str, float], max_cap: float) -> float:
+        """Calculate BM25 score between a prepared resume and a prepared job text, given the
+        job's query weights from _query_weights
+        """
+        doc_length, resume_tf, _ = resume_doc
+        job_length, _, query_terms = job_doc
+        
+        if not doc_length or not job_length or max_cap <= 0:
             return 0.0
         
-        # Calculate term frequencies
-        resume_tf = Counter(resume_tokens)
-        job_tf = Counter(job_tokens)
-        
-        # Use job terms as query
-        query_terms = set(job_tokens)
-        
         # Calculate average document length (simplified)
-        avg_doc_length = (len(resume_tokens) + len(job_tokens)) / 2
-        doc_length = len(resume_tokens)
+        avg_doc_length = (doc_length + job_length) / 2
+        length_norm = self.k1 * (1 - self.b + self.b * (doc_length / avg_doc_length))
         
+        # Use job terms as query; only terms present in the resume contribute. A pair
+        # matches a few dozen terms at most, where a plain loop beats building arrays
         score = 0.0
-        
         for term in query_terms:
-            # Term frequency in document (resume)
-            tf = resume_tf.get(term, 0)
-            
-            if tf > 0:
-                # IDF calculation (simplified - in real implementation you'd use corpus statistics)
-                # For now, we'll use a simple heuristic based on term rarity
-                idf = self._calculate_simple_idf(term, [resume_text, job_text])
-                
-                # BM25 formula
-                numerator = tf * (self.k1 + 1)
-                denominator = tf + self.k1 * (1 - self.b + self.b * (doc_length / avg_doc_length))
-                
-                score += idf * (numerator / denominator)
-        
-        # Normalize score
-        max_possible_score = len(query_terms) * 10  # Rough normalization
-        return min(1.0, score / max_possible_score) if max_possible_score > 0 else 0.0
+            tf = resume_tf.get(term)
+            if tf:
+                score += q_idf[term] * tf * (self.k1 + 1) / (tf + length_norm)
+        
+        return min(1.0, score / max_cap)
     
     def calculate_semantic_score(self, resume_vec: List[float], job_vec: List[float]) -> float:
         """Calculate semantic similarity score using embeddings"""
-        if not resume_vec or not job_vec:
+        if is_empty_vector(resume_vec) or is_empty_vector(job_vec):
             return 0.0
         
-        similarity = self.embedding_generator.cosine_similarity(resume_vec, job_vec)
+        # Stored vectors are unit length (normalized at write time), so cosine is a plain dot product
+        similarity = float(np.dot(np.asarray(resume_vec, dtype=np.float32), np.asarray(job_vec, dtype=np.float32)))
+        
+        # Convert from [-1, 1] to [0, 1] range
+        return (max(-1.0, min(1.0, similarity)) + 1) / 2
+    
+    def batch_cosine(self, vec: List[float], matrix: List[List[float]]) -> np.ndarray:
+        """Calculate semantic scores for one vector against every row of a matrix in a single product"""
+        rows = np.asarray(matrix, dtype=np.float32)
+        
+        # Stored vectors are unit length (normalized at write time), so cosine is a plain dot product
+        similarities = rows @ np.asarray(vec, dtype=np.float32)
         
         # Convert from [-1, 1] to [0, 1] range
-        return (similarity + 1) / 2
+        return (np.clip(similarities, -1.0, 1.0) + 1) / 2
+    
+    def _semantic_scores(self, vec: List[float], vecs: List[List[float]]) -> List[float]:
+        """Semantic scores of one vector against many, with one product over the non-empty vectors"""
+        scores = [0.0] * len(vecs)
+        if is_empty_vector(vec):
+            return scores
+        
+        positions = [i for i, other in enumerate(vecs) if not is_empty_vector(other)]
+        if positions:
+            batch = self.batch_cosine(vec, [vecs[i] for i in positions])
+            for i, score in zip(positions, batch.tolist()):
+                scores[i] = score
+        return scores
+    
+    def _batch_semantic_scores(self, resume_vecs: List[List[float]], job_vec: List[float]) -> np.ndarray:
+        """Calculate semantic scores for many resumes against one job in a single matrix-vector product"""
+        return self.batch_cosine(job_vec, resume_vecs)
+    
+    def bulk_score(self, job: Dict[str, Any], seekers: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """Score many seekers against one job, returning a score breakdown per seeker"""
+        if not seekers:
+            return []
+        
+        # Job-side work is done once for the whole batch
+        job_text = f"{job['title']} {job['description']}"
+        job_doc = self._prepare_doc(job_text)
+        job_skills = normalized_skills(job, 'skills_required')
+        job_min_exp = job.get('min_exp')
+        job_location = normalized_location(job)
+        
+        semantic_scores = self._batch_semantic_scores([seeker['resume_vec'] for seeker in seekers], job['job_vec'])
+        
+        q_idf, max_cap = self._query_weights(job_doc, *self._corpus_stats(job_doc[2]))
+        bm25_scores = [
+            self._bm25_from_prepared(self._prepare_doc(seeker.get('resume_text', '')), job_doc, q_idf, max_cap)
+            for seeker in seekers
+        ]
+        
+        rule_boosts = self._batch_rule_boosts(seekers, job_skills, job_min_exp, job_location)
+        
+        results = []
+        for semantic_score, bm25_score, rule_boost in zip(semantic_scores.tolist(), bm25_scores, rule_boosts):
+            results.append({
+                'bm25': bm25_score,
+                'semantic': semantic_score,
+                'rule_boost': rule_boost,
+                'final': self._combine_scores(bm25_score, semantic_score, rule_boost)
+            })
+        
+        return results
+    
+    def bulk_score_jobs(self, seeker: Dict[str, Any], jobs: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """Score one seeker against many jobs, returning a score breakdown per job"""
+        if not jobs:
+            return []
+        
+        # Seeker-side work is done once for the whole batch
+        resume_doc = self._prepare_doc(seeker.get('resume_text', ''))
+        resume_skills = normalized_skills(seeker, 'skills')
+        resume_exp = seeker.get('experience_years')
+        seeker_location = normalized_location(seeker)
+        
+        semantic_scores = self.batch_cosine(seeker['resume_vec'], [job['job_vec'] for job in jobs])
+        
+        # Corpus statistics for every job's terms in one lookup
+        job_docs = [self._prepare_doc(f"{job['title']} {job['description']}") for job in jobs]
+        doc_count, doc_freq = self._corpus_stats(frozenset().union(*(job_doc[2] for job_doc in job_docs)))
+        
+        results = []
+        for job, job_doc, semantic_score in zip(jobs, job_docs, semantic_scores.tolist()):
+            q_idf, max_cap = self._query_weights(job_doc, doc_count, doc_freq)
+            bm25_score = self._bm25_from_prepared(resume_doc, job_doc, q_idf, max_cap)
+            rule_boost = self.calculate_rule_boost(
+                resume_skills, normalized_skills(job, 'skills_required'),
+                resume_exp, job.get('min_exp'),
+                seeker_location == normalized_location(job)
+            )
+            results.append({
+                'bm25': bm25_score,
+                'semantic': semantic_score,
+                'rule_boost': rule_boost,
+                'final': self._combine_scores(bm25_score, semantic_score, rule_boost)
+            })
+        
+        return results
     
     def calculate_rule_boost(self,
                            resume_skills: List[str],
@@ -107,11 +296,17 @@ class RankingService:
                            job_min_exp: Optional[int] = None,
                            same_location: bool = False) -> float:
         """Calculate rule-based boost score"""
-        
+        return self._combine_rule_factors(
+            *self._rule_factors(resume_skills, job_skills, resume_exp, job_min_exp, same_location)
+        )
+    
+    def _rule_factors(self, resume_skills, job_skills, resume_exp: Optional[int],
+                      job_min_exp: Optional[int], same_location: bool) -> Tuple[float, float, float]:
+        """Skills, experience and location scores that make up the rule boost"""
         # Skills overlap using Jaccard similarity
-        skills_score = self._jaccard_similarity(
-            [skill.lower() for skill in resume_skills],
-            [skill.lower() for skill in job_skills]
+        skills_score = self._jaccard_sets(
+            self._as_skill_set(resume_skills),
+            self._as_skill_set(job_skills)
         )
         
         # Experience match score
@@ -120,65 +315,59 @@ class RankingService:
         # Location bonus
         location_score = 1.0 if same_location else 0.8
         
-        # Weighted combination of rule-based factors
-        rule_score = (
+        return skills_score, exp_score, location_score
+    
+    def _batch_rule_boosts(self, seekers: List[Dict[str, Any]], job_skills: frozenset,
+                           job_min_exp: Optional[int], job_location: str) -> List[float]:
+        """Rule boosts of many seekers against one job, with the experience and location
+        factors computed over arrays rather than per seeker
+        """
+        skills_scores = np.fromiter(
+            (self._jaccard_sets(normalized_skills(seeker, 'skills'), job_skills) for seeker in seekers),
+            dtype=np.float64, count=len(seekers)
+        )
+        exp_scores = self._batch_experience_scores([seeker.get('experience_years') for seeker in seekers], job_min_exp)
+        location_scores = np.fromiter(
+            (1.0 if normalized_location(seeker) == job_location else 0.8 for seeker in seekers),
+            dtype=np.float64, count=len(seekers)
+        )
+        return self._combine_rule_factors(skills_scores, exp_scores, location_scores).tolist()
+    
+    def _combine_rule_factors(self, skills_score: float, exp_score: float, location_score: float) -> float:
+        """Weighted combination of rule-based factors"""
+        return (
             0.6 * skills_score +
             0.3 * exp_score +
             0.1 * location_score
         )
-        
-        return rule_score
     
-    def _tokenize_and_clean(self, text: str) -> List[str]:
+    @staticmethod
+    def _tokenize_and_clean(text: str) -> List[str]:
         """Tokenize and clean text for BM25 calculation"""
         if not text:
             return []
         
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove punctuation and split into words
-        text = re.sub(r'[^\w\s]', ' ', text)
-        tokens = text.split()
-        
-        # Remove very short tokens and common stop words
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with',
-            'by', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'have', 'has', 'had',
-            'will', 'would', 'could', 'should', 'may', 'might', 'can', 'must', 'shall'
-        }
-        
-        tokens = [token for token in tokens if len(token) > 2 and token not in stop_words]
-        
-        return tokens
+        # Lowercase, replace punctuation with spaces, then drop very short tokens and stop words
+        tokens = _PUNCTUATION_RE.sub(' ', text.lower()).split()
+        return [token for token in tokens if len(token) > 2 and token not in _STOP_WORDS]
     
-    def _calculate_simple_idf(self, term: str, documents: List[str]) -> float:
-        """Calculate a simple IDF score"""
-        # Count documents containing the term
-        doc_count = sum(1 for doc in documents if term.lower() in doc.lower())
-        
-        if doc_count == 0:
-            return 0.0
-        
-        # Simple IDF calculation
-        return math.log(len(documents) / doc_count)
+    def _as_skill_set(self, skills) -> frozenset:
+        """Lowercase a skills list, passing precomputed sets through untouched"""
+        if isinstance(skills, (set, frozenset)):
+            return skills
+        return frozenset(skill.lower() for skill in skills)
     
-    def _jaccard_similarity(self, set1: List[str], set2: List[str]) -> float:
-        """Calculate Jaccard similarity between two lists"""
+    def _jaccard_sets(self, set1: frozenset, set2: frozenset) -> float:
+        """Calculate Jaccard similarity between two skill sets"""
         if not set1 and not set2:
             return 1.0  # Both empty sets are considered identical
         
         if not set1 or not set2:
             return 0.0  # One empty, one non-empty
         
-        # Convert to sets for intersection and union
-        s1 = set(set1)
-        s2 = set(set2)
-        
-        intersection = len(s1.intersection(s2))
-        union = len(s1.union(s2))
-        
-        return intersection / union if union > 0 else 0.0
+        # The union's size follows from the intersection, so no union set is built
+        intersection = len(set1 & set2)
+        return intersection / (len(set1) + len(set2) - intersection)
     
     def _calculate_experience_score(self, resume_exp: Optional[int], job_min_exp: Optional[int]) -> float:
         """Calculate experience match score"""
@@ -200,48 +389,84 @@ class RankingService:
             penalty = min(0.8, deficit * 0.2)  # Max 80% penalty
             return 1.0 - penalty
     
+    def _batch_experience_scores(self, resume_exps: List[Optional[int]], job_min_exp: Optional[int]) -> np.ndarray:
+        """_calculate_experience_score over many resumes at once"""
+        if job_min_exp is None:
+            return np.full(len(resume_exps), 0.5)
+        
+        missing = np.fromiter((exp is None for exp in resume_exps), dtype=bool, count=len(resume_exps))
+        exps = np.fromiter(
+            (job_min_exp if exp is None else exp for exp in resume_exps), dtype=np.float64, count=len(resume_exps)
+        )
+        
+        # Same penalties as the scalar version: up to 30% for overqualified, 80% for underqualified
+        excess = np.clip(exps - job_min_exp - 2, 0, None)
+        deficit = np.clip(job_min_exp - exps, 0, None)
+        scores = np.where(
+            exps >= job_min_exp,
+            1.0 - np.minimum(0.3, excess * 0.05),
+            1.0 - np.minimum(0.8, deficit * 0.2)
+        )
+        return np.where(missing, 0.5, scores)
+    
     def rank_candidates(self, 
                        candidates: List[Dict[str, Any]], 
-                       job_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Rank a list of candidates for a given job"""
+                       job_data: Dict[str, Any],
+                       top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rank a list of candidates for a given job
+        
+        With top_k, only the best top_k candidates are returned, and candidates that
+        cannot reach them even with a perfect BM25 score are never BM25-scored.
+        """
         
         job_text = f"{job_data.get('title', '')} {job_data.get('description', '')}"
         job_vec = job_data.get('job_vec', [])
-        job_skills = job_data.get('skills_required', [])
+        job_skills = normalized_skills(job_data, 'skills_required')
         job_min_exp = job_data.get('min_exp')
-        job_location = job_data.get('location', '').lower()
+        job_location = normalized_location(job_data)
+        job_doc = self._prepare_doc(job_text)
         
-        ranked_candidates = []
+        # IDF and score cap, computed once for the job
+        resume_docs = [self._prepare_doc(candidate.get('resume_text', '')) for candidate in candidates]
+        q_idf, max_cap = self._query_weights(job_doc, *self._corpus_stats(job_doc[2]))
         
-        for candidate in candidates:
-            resume_text = candidate.get('resume_text', '')
-            resume_vec = candidate.get('resume_vec', [])
-            resume_skills = candidate.get('skills', [])
-            resume_exp = candidate.get('experience_years')
-            candidate_location = candidate.get('location', '').lower()
-            
-            # Calculate hybrid score
-            score = self.calculate_hybrid_score(
-                resume_text=resume_text,
-                resume_vec=resume_vec,
-                job_text=job_text,
-                job_vec=job_vec,
-                resume_skills=resume_skills,
-                job_skills=job_skills,
-                resume_exp=resume_exp,
-                job_min_exp=job_min_exp,
-                same_location=(candidate_location == job_location)
-            )
-            
+        # Semantic scores for every candidate in one matrix-vector product
+        semantic_scores = self._semantic_scores(job_vec, [candidate.get('resume_vec') for candidate in candidates])
+        rule_boosts = self._batch_rule_boosts(candidates, job_skills, job_min_exp, job_location)
+        
+        def final_score(i: int) -> float:
+            bm25_score = self._bm25_from_prepared(resume_docs[i], job_doc, q_idf, max_cap)
+            return self._combine_scores(bm25_score, semantic_scores[i], rule_boosts[i])
+        
+        if top_k is None:
+            scored = [(final_score(i), i) for i in range(len(candidates))]
+        elif top_k <= 0:
+            scored = []
+        else:
+            # The best final score a candidate could get is with a BM25 score of 1.0; visit
+            # candidates by that bound and stop once it can't beat the current k-th best
+            bounds = [self._combine_scores(1.0, semantic_scores[i], rule_boosts[i]) for i in range(len(candidates))]
+            heap = []  # (score, -index): the weakest kept candidate, latest on ties, is on top
+            for i in sorted(range(len(candidates)), key=lambda i: -bounds[i]):
+                if len(heap) >= top_k and bounds[i] < heap[0][0]:
+                    break
+                entry = (final_score(i), -i)
+                if len(heap) < top_k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+            scored = [(score, -neg_i) for score, neg_i in heap]
+        
+        # Sort by score (descending), keeping the input order between equal scores
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        
+        ranked_candidates = []
+        for score, i in scored:
             # Add score to candidate data
-            candidate_with_score = candidate.copy()
+            candidate_with_score = candidates[i].copy()
             candidate_with_score['match_score'] = score
-            
             ranked_candidates.append(candidate_with_score)
         
-        # Sort by score (descending)
-        ranked_candidates.sort(key=lambda x: x['match_score'], reverse=True)
-        
         return ranked_candidates
     
     def rank_jobs_for_candidate(self,
@@ -249,33 +474,30 @@ class RankingService:
                                jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Rank a list of jobs for a given candidate"""
         
-        resume_text = candidate_data.get('resume_text', '')
+        resume_doc = self._prepare_doc(candidate_data.get('resume_text', ''))
         resume_vec = candidate_data.get('resume_vec', [])
-        resume_skills = candidate_data.get('skills', [])
+        resume_skills = normalized_skills(candidate_data, 'skills')
         resume_exp = candidate_data.get('experience_years')
-        candidate_location = candidate_data.get('location', '').lower()
+        candidate_location = normalized_location(candidate_data)
+        
+        # Semantic scores for every job in one matrix-vector product
+        semantic_scores = self._semantic_scores(resume_vec, [job.get('job_vec') for job in jobs])
+        
+        # Corpus statistics for every job's terms in one lookup
+        job_docs = [self._prepare_doc(f"{job.get('title', '')} {job.get('description', '')}") for job in jobs]
+        doc_count, doc_freq = self._corpus_stats(frozenset().union(*(job_doc[2] for job_doc in job_docs)))
         
         ranked_jobs = []
         
-        for job in jobs:
-            job_text = f"{job.get('title', '')} {job.get('description', '')}"
-            job_vec = job.get('job_vec', [])
-            job_skills = job.get('skills_required', [])
-            job_min_exp = job.get('min_exp')
-            job_location = job.get('location', '').lower()
-            
-            # Calculate hybrid score
-            score = self.calculate_hybrid_score(
-                resume_text=resume_text,
-                resume_vec=resume_vec,
-                job_text=job_text,
-                job_vec=job_vec,
-                resume_skills=resume_skills,
-                job_skills=job_skills,
-                resume_exp=resume_exp,
-                job_min_exp=job_min_exp,
-                same_location=(candidate_location == job_location)
+        for job, job_doc, semantic_score in zip(jobs, job_docs, semantic_scores):
+            q_idf, max_cap = self._query_weights(job_doc, doc_count, doc_freq)
+            bm25_score = self._bm25_from_prepared(resume_doc, job_doc, q_idf, max_cap)
+            rule_boost = self.calculate_rule_boost(
+                resume_skills, normalized_skills(job, 'skills_required'),
+                resume_exp, job.get('min_exp'),
+                candidate_location == normalized_location(job)
             )
+            score = self._combine_scores(bm25_score, semantic_score, rule_boost)
             
             # Add score to job data
             job_with_score = job.copy()
@@ -300,16 +522,20 @@ class RankingService:
                      same_location: bool = False) -> Dict[str, Any]:
         """Provide detailed explanation of how the score was calculated"""
         
-        # Calculate individual components
+        # Lowercase each skills list once for the rule boost and the factor breakdown
+        resume_skill_set = self._as_skill_set(resume_skills)
+        job_skill_set = self._as_skill_set(job_skills)
+        
+        # Calculate each component once; the factor breakdown reuses the rule boost's parts
         bm25_score = self.calculate_bm25_score(resume_text, job_text)
         semantic_score = self.calculate_semantic_score(resume_vec, job_vec)
-        rule_boost = self.calculate_rule_boost(resume_skills, job_skills, resume_exp, job_min_exp, same_location)
+        skills_score, exp_score, location_score = self._rule_factors(
+            resume_skill_set, job_skill_set, resume_exp, job_min_exp, same_location
+        )
+        rule_boost = self._combine_rule_factors(skills_score, exp_score, location_score)
         
         # Calculate final score
-        final_score = self.calculate_hybrid_score(
-            resume_text, resume_vec, job_text, job_vec,
-            resume_skills, job_skills, resume_exp, job_min_exp, same_location
-        )
+        final_score = self._combine_scores(bm25_score, semantic_score, rule_boost)
         
         # Detailed breakdown
         explanation = {
@@ -335,17 +561,15 @@ class RankingService:
                 }
             },
             'factors': {
-                'skills_match': self._jaccard_similarity(
-                    [s.lower() for s in resume_skills],
-                    [s.lower() for s in job_skills]
-                ),
-                'experience_match': self._calculate_experience_score(resume_exp, job_min_exp),
+                'skills_match': skills_score,
+                'experience_match': exp_score,
                 'location_match': same_location,
-                'matching_skills': list(set([s.lower() for s in resume_skills]) & 
-                                      set([s.lower() for s in job_skills])),
-                'missing_skills': list(set([s.lower() for s in job_skills]) - 
-                                     set([s.lower() for s in resume_skills]))
+                'matching_skills': list(resume_skill_set & job_skill_set),
+                'missing_skills': list(job_skill_set - resume_skill_set)
             }
         }
         
         return explanation
+
+# Global instance, weighting BM25 terms by their frequency across indexed resumes
+ranking_service = RankingService(term_stats=user_repo.resume_term_stats)
@@ -1,16 +1,78 @@
+import copy
+import hashlib
 import re
+import threading
 import PyPDF2
 import docx
 from io import BytesIO
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, List, Optional
 import spacy
+from cachetools import LRUCache
 from datetime import datetime
 
+try:
+    # PDFium extracts text natively, far faster than PyPDF2's pure-Python parser
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+# PDFium is not thread-safe; request threads and the upload pool share this lock for all of it
+_PDFIUM_LOCK = threading.Lock()
+
+# Patterns compiled once at import
+_EXPERIENCE_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r'(\d+)\+?\s*years?\s*(?:of\s*)?experience',
+    r'(\d+)\+?\s*years?\s*in',
+    r'experience.*?(\d+)\+?\s*years?',
+    r'(\d+)\+?\s*yrs?\s*(?:of\s*)?experience',
+))
+# Job date ranges like "2020-2023" or "2020 - present"
+_DATE_RANGE_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'(\d{4})\s*[-–]\s*(\d{4})',
+    r'(\d{4})\s*[-–]\s*present',
+    r'(\d{4})\s*[-–]\s*current',
+))
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_PHONE_RE = re.compile(r'[\+]?[1-9]?[0-9]{0,3}[-.\s]?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}')
+_LINKEDIN_RE = re.compile(r'linkedin\.com/in/[\w-]+', re.IGNORECASE)
+
+def _keywords_re(keywords: List[str]):
+    """One pattern matching any keyword anywhere (substring match, like `keyword in text`)"""
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+_EDUCATION_RE = _keywords_re([
+    'bachelor', 'master', 'phd', 'doctorate', 'degree', 'university',
+    'college', 'institute', 'school', 'certification', 'certified'
+])
+_SECTION_RES = {
+    section: _keywords_re(keywords)
+    for section, keywords in {
+        'experience': ['experience', 'work history', 'employment', 'career'],
+        'education': ['education', 'academic', 'degree', 'university'],
+        'skills': ['skills', 'technical skills', 'competencies', 'proficiencies'],
+        'projects': ['projects', 'portfolio', 'work samples'],
+        'certifications': ['certifications', 'certificates', 'licensed'],
+        'awards': ['awards', 'achievements', 'honors', 'recognition']
+    }.items()
+}
+
+# How many extracted texts and parse results each parser keeps for re-uploads and re-parses
+PARSE_CACHE_SIZE = 256
+HASH_CHUNK_SIZE = 64 * 1024
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
 class ResumeParser:
     def __init__(self):
         try:
-            # Load spaCy model for NLP
-            self.nlp = spacy.load("en_core_web_sm")
+            # Load spaCy model for NLP; only named entities are used, and the small model's
+            # NER has its own embedding layer, so the shared tok2vec and its consumers are skipped
+            self.nlp = spacy.load(
+                "en_core_web_sm",
+                disable=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"]
+            )
         except OSError:
             # Fallback if spaCy model not installed
             self.nlp = None
@@ -44,30 +106,85 @@ class ResumeParser:
         self.all_skills = []
         for category in self.skills_keywords.values():
             self.all_skills.extend(category)
+        
+        # Every skill in one pass over the text. Matching inside a lookahead lets skills
+        # overlap as separate searches would; longer names are tried first at each position.
+        alternatives = sorted({skill.lower() for skill in self.all_skills}, key=len, reverse=True)
+        self._skills_pattern = re.compile(
+            r'\b(?=(' + '|'.join(re.escape(skill) for skill in alternatives) + r')\b)'
+        )
+        
+        # Results keyed by a digest of the file bytes or resume text
+        self._text_cache = LRUCache(maxsize=PARSE_CACHE_SIZE)
+        self._parse_cache = LRUCache(maxsize=PARSE_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
     
     def extract_text(self, file) -> str:
-        """Extract text from PDF or DOCX file"""
+        """Extract text from PDF or DOCX file
+        
+        The file is hashed in chunks for the cache lookup and then handed to the extractor
+        as-is, so it is never buffered whole in memory.
+        """
         try:
-            file.seek(0)  # Reset file pointer
-            content = file.read()
-            file_stream = BytesIO(content)
-            
             filename = getattr(file, 'name', '')
-            
-            if filename.lower().endswith('.pdf'):
-                return self._extract_pdf_text(file_stream)
-            elif filename.lower().endswith('.docx'):
-                return self._extract_docx_text(file_stream)
-            else:
-                raise ValueError("Unsupported file format")
-                
+            file.seek(0)  # Reset file pointer
+            hasher = hashlib.blake2b(digest_size=16)
+            for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+            file.seek(0)
+            return self._extract_cached(file, filename, hasher.digest())
+        except Exception as e:
+            print(f"Error extracting text: {str(e)}")
+            return ""
+    
+    def extract_text_from_bytes(self, content: bytes, filename: str) -> str:
+        """Extract text from already-read PDF or DOCX bytes, reusing the result for identical files"""
+        try:
+            # BytesIO shares the bytes object rather than copying it
+            return self._extract_cached(BytesIO(content), filename, _digest(content))
         except Exception as e:
             print(f"Error extracting text: {str(e)}")
             return ""
     
-    def _extract_pdf_text(self, file_stream: BytesIO) -> str:
+    def _extract_cached(self, file_stream, filename: str, digest: bytes) -> str:
+        """Extract text from a PDF or DOCX stream, keyed in the cache by file type and content digest"""
+        if filename.lower().endswith('.pdf'):
+            extract = self._extract_pdf_text
+        elif filename.lower().endswith('.docx'):
+            extract = self._extract_docx_text
+        else:
+            raise ValueError("Unsupported file format")
+        
+        cache_key = (filename.lower().rsplit('.', 1)[-1], digest)
+        with self._cache_lock:
+            text = self._text_cache.get(cache_key)
+        if text is None:
+            text = extract(file_stream)
+            # Failed extractions return "" and are retried next time
+            if text:
+                with self._cache_lock:
+                    self._text_cache[cache_key] = text
+        return text
+    
+    def _extract_pdf_text(self, file_stream: BinaryIO) -> str:
         """Extract text from PDF"""
         try:
+            if PDFIUM_AVAILABLE:
+                # Pages and text pages are closed inside the lock too, rather than by
+                # finalizers that could run on another thread
+                with _PDFIUM_LOCK:
+                    pdf = pdfium.PdfDocument(file_stream)
+                    try:
+                        texts = []
+                        for page in pdf:
+                            textpage = page.get_textpage()
+                            texts.append(textpage.get_text_range())
+                            textpage.close()
+                            page.close()
+                    finally:
+                        pdf.close()
+                return "\n".join(texts).strip()
+            
             pdf_reader = PyPDF2.PdfReader(file_stream)
             text = ""
             
@@ -80,7 +197,7 @@ class ResumeParser:
             print(f"Error extracting PDF text: {str(e)}")
             return ""
     
-    def _extract_docx_text(self, file_stream: BytesIO) -> str:
+    def _extract_docx_text(self, file_stream: BinaryIO) -> str:
         """Extract text from DOCX"""
         try:
             doc = docx.Document(file_stream)
@@ -100,6 +217,20 @@ class ResumeParser:
         if not text:
             return {}
         
+        cache_key = _digest(text.encode('utf-8'))
+        with self._cache_lock:
+            cached = self._parse_cache.get(cache_key)
+        if cached is not None:
+            # Callers may modify the result, so each gets its own copy
+            return copy.deepcopy(cached)
+        
+        result = self._parse_resume_uncached(text)
+        with self._cache_lock:
+            self._parse_cache[cache_key] = result
+        return copy.deepcopy(result)
+    
+    def _parse_resume_uncached(self, text: str) -> Dict:
+        """Parse resume text without consulting the cache"""
         text_lower = text.lower()
         
         result = {
@@ -114,31 +245,16 @@ class ResumeParser:
     
     def _extract_skills(self, text: str) -> List[str]:
         """Extract skills from resume text"""
-        found_skills = []
-        
-        for skill in self.all_skills:
-            # Use word boundaries to avoid partial matches
-            pattern = r'\b' + re.escape(skill.lower()) + r'\b'
-            if re.search(pattern, text):
-                found_skills.append(skill)
-        
-        # Remove duplicates and return
-        return list(set(found_skills))
+        # Word boundaries in the pattern avoid partial matches; the set removes duplicates
+        return list(set(self._skills_pattern.findall(text)))
     
     def _extract_experience_years(self, text: str) -> Optional[int]:
         """Extract years of experience from resume text"""
-        # Common patterns for experience
-        experience_patterns = [
-            r'(\d+)\+?\s*years?\s*(?:of\s*)?experience',
-            r'(\d+)\+?\s*years?\s*in',
-            r'experience.*?(\d+)\+?\s*years?',
-            r'(\d+)\+?\s*yrs?\s*(?:of\s*)?experience',
-        ]
-        
         text_lower = text.lower()
         
-        for pattern in experience_patterns:
-            matches = re.findall(pattern, text_lower)
+        # Common patterns for experience
+        for pattern in _EXPERIENCE_PATTERNS:
+            matches = pattern.findall(text_lower)
             if matches:
                 try:
                     # Return the maximum years found
@@ -153,18 +269,12 @@ class ResumeParser:
     
     def _infer_experience_from_dates(self, text: str) -> Optional[int]:
         """Infer experience years from job dates in resume"""
-        # Look for date patterns like "2020-2023", "Jan 2020 - Dec 2023", etc.
-        date_patterns = [
-            r'(\d{4})\s*[-–]\s*(\d{4})',
-            r'(\d{4})\s*[-–]\s*present',
-            r'(\d{4})\s*[-–]\s*current',
-        ]
-        
         current_year = datetime.now().year
         total_experience = 0
         
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        # Look for date patterns like "2020-2023", "Jan 2020 - Dec 2023", etc.
+        for pattern in _DATE_RANGE_PATTERNS:
+            matches = pattern.findall(text)
             for match in matches:
                 try:
                     start_year = int(match[0])
@@ -179,41 +289,34 @@ class ResumeParser:
     
     def _extract_education(self, text: str) -> List[str]:
         """Extract education information"""
-        education_keywords = [
-            'bachelor', 'master', 'phd', 'doctorate', 'degree', 'university',
-            'college', 'institute', 'school', 'certification', 'certified'
-        ]
-        
         education_info = []
-        lines = text.split('\n')
         
-        for line in lines:
-            line_lower = line.lower().strip()
-            if any(keyword in line_lower for keyword in education_keywords):
-                if len(line.strip()) > 10:  # Filter out too short lines
-                    education_info.append(line.strip())
+        for line in text.split('\n'):
+            line = line.strip()
+            # Filter out too short lines, then look for any education keyword in one scan
+            if len(line) > 10 and _EDUCATION_RE.search(line.lower()):
+                education_info.append(line)
+                if len(education_info) == 5:  # Limit to 5 entries
+                    break
         
-        return education_info[:5]  # Limit to 5 entries
+        return education_info
     
     def _extract_contact_info(self, text: str) -> Dict[str, str]:
         """Extract contact information"""
         contact_info = {}
         
-        # Email pattern
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
+        # Email
+        emails = _EMAIL_RE.findall(text)
         if emails:
             contact_info['email'] = emails[0]
         
-        # Phone pattern
-        phone_pattern = r'[\+]?[1-9]?[0-9]{0,3}[-.\s]?\(?[0-9]{3}\)?[-.\s]?[0-9]{3}[-.\s]?[0-9]{4}'
-        phones = re.findall(phone_pattern, text)
+        # Phone
+        phones = _PHONE_RE.findall(text)
         if phones:
             contact_info['phone'] = phones[0]
         
-        # LinkedIn pattern
-        linkedin_pattern = r'linkedin\.com/in/[\w-]+'
-        linkedin_matches = re.findall(linkedin_pattern, text, re.IGNORECASE)
+        # LinkedIn
+        linkedin_matches = _LINKEDIN_RE.findall(text)
         if linkedin_matches:
             contact_info['linkedin'] = linkedin_matches[0]
         
@@ -221,38 +324,32 @@ class ResumeParser:
     
     def _identify_sections(self, text: str) -> Dict[str, bool]:
         """Identify common resume sections"""
-        sections = {
-            'experience': False,
-            'education': False,
-            'skills': False,
-            'projects': False,
-            'certifications': False,
-            'awards': False
-        }
-        
         text_lower = text.lower()
         
-        section_keywords = {
-            'experience': ['experience', 'work history', 'employment', 'career'],
-            'education': ['education', 'academic', 'degree', 'university'],
-            'skills': ['skills', 'technical skills', 'competencies', 'proficiencies'],
-            'projects': ['projects', 'portfolio', 'work samples'],
-            'certifications': ['certifications', 'certificates', 'licensed'],
-            'awards': ['awards', 'achievements', 'honors', 'recognition']
-        }
-        
-        for section, keywords in section_keywords.items():
-            if any(keyword in text_lower for keyword in keywords):
-                sections[section] = True
-        
-        return sections
+        # One compiled scan per section instead of a substring search per keyword
+        return {section: bool(pattern.search(text_lower)) for section, pattern in _SECTION_RES.items()}
     
     def extract_entities(self, text: str) -> Dict[str, List[str]]:
         """Extract named entities using spaCy (if available)"""
         if not self.nlp or not text:
             return {}
         
-        doc = self.nlp(text)
+        return self._entities_from_doc(self.nlp(text))
+    
+    def extract_entities_batch(self, texts: List[str], batch_size: int = 32) -> List[Dict[str, List[str]]]:
+        """Extract named entities from many texts, letting spaCy process them in batches"""
+        if not self.nlp:
+            return [{} for _ in texts]
+        
+        # Empty texts get {} like extract_entities; only the rest go through the pipeline
+        results = [{} for _ in texts]
+        positions = [i for i, text in enumerate(texts) if text]
+        docs = self.nlp.pipe((texts[i] for i in positions), batch_size=batch_size, n_process=1)
+        for i, doc in zip(positions, docs):
+            results[i] = self._entities_from_doc(doc)
+        return results
+    
+    def _entities_from_doc(self, doc) -> Dict[str, List[str]]:
         entities = {
             'organizations': [],
             'locations': [],
@@ -275,3 +372,6 @@ class ResumeParser:
             entities[key] = list(set(entities[key]))
         
         return entities
+
+# Global instance
+resume_parser = ResumeParser()
@@ -0,0 +1,73 @@
+from django.test import SimpleTestCase
+
+from ml.ranking import RankingService
+
+# A fixed resume corpus, so IDF doesn't depend on a running Elasticsearch
+RESUME_COUNT = 100
+DOC_FREQ = {
+    'backend': 40, 'engineer': 65, 'python': 60, 'django': 25, 'developer': 70,
+    'building': 30, 'rest': 15, 'apis': 20, 'postgresql': 10, 'java': 35, 'spring': 12
+}
+
+def corpus_stats(terms):
+    return RESUME_COUNT, {term: DOC_FREQ.get(term, 0) for term in terms}
+
+JOB = {
+    'title': 'Backend Engineer',
+    'description': 'Python Django developer building REST APIs on PostgreSQL',
+    'job_vec': [1.0, 0.0],
+    'skills_required': ['Python'],
+    'min_exp': 3,
+    'location': 'Remote'
+}
+JOB_TEXT = f"{JOB['title']} {JOB['description']}"
+OTHER_JOB = dict(JOB, title='Java Engineer', description='Spring developer')
+
+def seeker(resume_text):
+    return {
+        'resume_text': resume_text,
+        'resume_vec': [0.0, 1.0],
+        'skills': ['Python'],
+        'experience_years': 4,
+        'location': 'Remote'
+    }
+
+HALF_MATCH = 'Python Django developer with Java and Spring'
+
+# BM25 of HALF_MATCH against JOB under the corpus above
+HALF_MATCH_BM25 = 0.2451360
+
+
+class BM25ScaleTests(SimpleTestCase):
+    def setUp(self):
+        self.service = RankingService(term_stats=corpus_stats)
+    
+    def test_resume_identical_to_job_scores_one(self):
+        self.assertAlmostEqual(self.service.calculate_bm25_score(JOB_TEXT, JOB_TEXT), 1.0)
+    
+    def test_unrelated_resume_scores_zero(self):
+        self.assertEqual(self.service.calculate_bm25_score('Java Spring', JOB_TEXT), 0.0)
+    
+    def test_pairwise_score_is_pinned(self):
+        self.assertAlmostEqual(self.service.calculate_bm25_score(HALF_MATCH, JOB_TEXT), HALF_MATCH_BM25, places=6)
+    
+    def test_batch_scores_match_pairwise_score(self):
+        others = [seeker(JOB_TEXT), seeker('Java Spring'), seeker('Django REST APIs')]
+        
+        alone = self.service.bulk_score(JOB, [seeker(HALF_MATCH)])[0]['bm25']
+        in_batch = self.service.bulk_score(JOB, [seeker(HALF_MATCH)] + others)[0]['bm25']
+        across_jobs = self.service.bulk_score_jobs(seeker(HALF_MATCH), [OTHER_JOB, JOB])[1]['bm25']
+        
+        for score in (alone, in_batch, across_jobs):
+            self.assertAlmostEqual(score, HALF_MATCH_BM25, places=6)
+    
+    def test_final_scores_match_between_apply_and_rerank(self):
+        candidate = seeker(HALF_MATCH)
+        applied = self.service.score(
+            HALF_MATCH, candidate['resume_vec'], JOB_TEXT, JOB['job_vec'],
+            candidate['skills'], JOB['skills_required'], candidate['experience_years'],
+            JOB['min_exp'], True
+        )
+        reranked = self.service.bulk_score(JOB, [seeker('Java Spring'), candidate])[1]
+        
+        self.assertAlmostEqual(applied['final'], reranked['final'])
@@ -1,6 +1,8 @@
 import os
+import threading
 import uuid
 from typing import Optional
+from cachetools import TTLCache
 from django.conf import settings
 from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import UploadedFile
@@ -21,6 +23,10 @@ class FileStorage:
                 self.storage = FileSystemStorage(location=settings.MEDIA_ROOT)
         else:
             self.storage = FileSystemStorage(location=settings.MEDIA_ROOT)
+        
+        # Sizes are a HEAD request on S3; stored files don't change under the same name
+        self._size_cache = TTLCache(maxsize=1024, ttl=300)
+        self._size_lock = threading.Lock()
     
     def save_file(self, file: UploadedFile, filename: str = None) -> str:
         """Save uploaded file and return the file path"""
@@ -29,10 +35,7 @@ class FileStorage:
             file_extension = os.path.splitext(file.name)[1]
             filename = f"{uuid.uuid4()}{file_extension}"
         
-        # Ensure the filename is unique
-        filename = self.storage.get_available_name(filename)
-        
-        # Save the file
+        # Save the file; save() itself picks an unused name, so no separate existence probe
         file_path = self.storage.save(filename, file)
         
         return file_path
@@ -45,11 +48,21 @@ class FileStorage:
             return f"{settings.MEDIA_URL}{file_path}"
     
     def delete_file(self, file_path: str) -> bool:
-        """Delete a file"""
+        """Delete a file with a single storage call
+        
+        Locally, returns whether the file existed. S3 deletes succeed whether or not the
+        key exists, so there it returns True once the delete has gone through.
+        """
+        with self._size_lock:
+            self._size_cache.pop(file_path, None)
+        
         try:
-            if self.storage.exists(file_path):
+            if isinstance(self.storage, FileSystemStorage):
+                os.remove(self.storage.path(file_path))
+            else:
                 self.storage.delete(file_path)
-                return True
+            return True
+        except FileNotFoundError:
             return False
         except Exception as e:
             print(f"Error deleting file {file_path}: {e}")
@@ -60,11 +73,20 @@ class FileStorage:
         return self.storage.exists(file_path)
     
     def get_file_size(self, file_path: str) -> Optional[int]:
-        """Get file size in bytes"""
+        """Get file size in bytes, cached briefly per path"""
+        with self._size_lock:
+            size = self._size_cache.get(file_path)
+        if size is not None:
+            return size
+        
         try:
-            return self.storage.size(file_path)
+            size = self.storage.size(file_path)
         except Exception:
             return None
+        
+        with self._size_lock:
+            self._size_cache[file_path] = size
+        return size
 
 class ResumeFileStorage(FileStorage):
     """Specialized storage for resume files"""